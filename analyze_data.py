@@ -4,7 +4,6 @@ Quick data analysis script to explore cleaned Uganda health data
 Connects to PostgreSQL database
 """
 
-import pandas as pd
 from pathlib import Path
 
 def main():
@@ -29,82 +28,133 @@ def main():
         print("Make sure PostgreSQL is running and the database exists")
         return
 
-    # Load data from database
-    query = """
+    cur = conn.cursor()
+
+    # Aggregates are computed in PostgreSQL; only summary rows come back
+    cur.execute("""
     SELECT
-        f.fact_id,
-        i.indicator_name,
-        d.period_label,
-        d.year,
-        f.value,
-        f.units,
-        f.notes
-    FROM health.fact_indicator_values f
-    JOIN health.dim_indicator i ON f.indicator_id = i.indicator_id
-    JOIN health.dim_date d ON f.date_id = d.date_id
-    """
-    combined = pd.read_sql(query, conn)
-    print(f"[OK] Loaded {len(combined)} records from database")
-    
+        COUNT(*) as total_records,
+        COUNT(DISTINCT indicator_name) as unique_indicators,
+        COUNT(DISTINCT period_label) as unique_periods,
+        MIN(year) as min_year,
+        MAX(year) as max_year,
+        COUNT(value) as value_count,
+        AVG(value) as mean_value,
+        STDDEV_SAMP(value) as std_value,
+        MIN(value) as min_value,
+        PERCENTILE_CONT(0.25) WITHIN GROUP (ORDER BY value) as p25_value,
+        PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY value) as p50_value,
+        PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY value) as p75_value,
+        MAX(value) as max_value,
+        SUM(CASE WHEN value < 0 THEN 1 ELSE 0 END) as negative_values,
+        SUM(CASE WHEN value = 0 THEN 1 ELSE 0 END) as zero_values
+    FROM health.mv_flat
+    """)
+    (total_records, unique_indicators, unique_periods, min_year, max_year,
+     value_count, mean_value, std_value, min_value, p25_value, p50_value,
+     p75_value, max_value, negative_values, zero_values) = cur.fetchone()
+    print(f"[OK] Summarised {total_records} records from database")
+
+    if total_records == 0:
+        print("No records found in health.mv_flat - run the pipeline first")
+        conn.close()
+        return
+
     # Overall statistics
     print("OVERALL STATISTICS")
     print("-" * 70)
-    print(f"Total Records: {len(combined):,}")
-    print(f"Unique Indicators: {combined['indicator_name'].nunique()}")
-    print(f"Time Periods: {combined['period_label'].nunique()}")
-    print(f"Year Range: {combined['year'].min()} to {combined['year'].max()}")
-    print(f"Value Range: {combined['value'].min():.2f} to {combined['value'].max():.2f}")
+    print(f"Total Records: {total_records:,}")
+    print(f"Unique Indicators: {unique_indicators}")
+    print(f"Time Periods: {unique_periods}")
+    print(f"Year Range: {min_year} to {max_year}")
+    print(f"Value Range: {min_value:.2f} to {max_value:.2f}")
     print()
-    
+
     # Records by year
+    cur.execute("""
+    SELECT period_label, COUNT(*), AVG(value)
+    FROM health.mv_flat
+    GROUP BY period_label
+    ORDER BY period_label
+    """)
+    # One row per period, kept for the trends section below
+    period_rows = cur.fetchall()
+
     print("RECORDS BY PERIOD")
     print("-" * 70)
-    year_counts = combined['period_label'].value_counts().sort_index()
-    for year, count in year_counts.items():
+    for year, count, _ in period_rows:
         bar = "*" * int(count / 500)  # Scale down for readability
         print(f"{year}: {count:>4} {bar}")
     print()
 
     # Records by indicator (top 10)
+    cur.execute("""
+    SELECT indicator_name, COUNT(*)
+    FROM health.mv_flat
+    GROUP BY indicator_name
+    ORDER BY COUNT(*) DESC
+    LIMIT 10
+    """)
+
     print("TOP 10 INDICATORS BY RECORD COUNT")
     print("-" * 70)
-    indicator_counts = combined['indicator_name'].value_counts().head(10)
-    for indicator, count in indicator_counts.items():
-        percentage = (count / len(combined)) * 100
+    for indicator, count in cur:
+        percentage = (count / total_records) * 100
         bar = "*" * int(percentage * 2)
         print(f"{indicator[:30]:30s}: {count:>4} ({percentage:5.1f}%) {bar}")
     print()
-    
+
     # Value statistics
     print("VALUE STATISTICS")
     print("-" * 70)
-    print(combined['value'].describe().to_string())
+    value_stats = [
+        ("count", value_count), ("mean", mean_value), ("std", std_value),
+        ("min", min_value), ("25%", p25_value), ("50%", p50_value),
+        ("75%", p75_value), ("max", max_value)
+    ]
+    for label, stat in value_stats:
+        print(f"{label:<6}{float(stat or 0):>16.6f}")
     print()
-    
+
     # Sample data
+    cur.execute("""
+    SELECT indicator_name, period_label, value
+    FROM health.mv_flat
+    LIMIT 10
+    """)
+
     print("SAMPLE RECORDS")
     print("-" * 70)
-    print(combined[['indicator_name', 'period_label', 'value']].head(10).to_string(index=False))
+    print(f"{'indicator_name':<40} {'period_label':>12} {'value':>12}")
+    for indicator, period, value in cur:
+        print(f"{indicator[:40]:<40} {period:>12} {float(value):>12.2f}")
     print()
-    
+
     # Period-over-period trends (simple)
     print("PERIOD-OVER-PERIOD TRENDS (AVERAGE VALUES)")
     print("-" * 70)
-    period_avg = combined.groupby('period_label')['value'].mean()
-    for period, avg in period_avg.items():
+    for period, _, avg in period_rows:
+        avg = float(avg or 0)
         bar = "*" * int(avg / 100)  # Scale based on data range
         print(f"{period}: {avg:>8.2f} {bar}")
     print()
-    
+
+    # Duplicates ignore the surrogate fact_id, which is always unique
+    cur.execute("""
+    SELECT COUNT(*) - COUNT(DISTINCT (indicator_name, period_label, year, value, units, notes))
+    FROM health.mv_flat
+    """)
+    duplicate_records = cur.fetchone()[0]
+
     # Data quality metrics
     print("DATA QUALITY METRICS")
     print("-" * 70)
-    print(f"Records with non-null values: {len(combined):,} (100%)")
-    print(f"Duplicate records: {combined.duplicated().sum()}")
-    print(f"Negative values: {(combined['value'] < 0).sum()}")
-    print(f"Zero values: {(combined['value'] == 0).sum()}")
+    print(f"Records with non-null values: {value_count:,} ({value_count / total_records:.0%})")
+    print(f"Duplicate records: {duplicate_records}")
+    print(f"Negative values: {negative_values}")
+    print(f"Zero values: {zero_values}")
     print()
-    
+
     # Close database connection
     conn.close()
 
@@ -4,18 +4,32 @@ Provides API key-based authentication for the Uganda Health API
 """
 from fastapi import Security, HTTPException, status
 from fastapi.security import APIKeyHeader
+import hmac
 import os
+from functools import lru_cache
+from types import MappingProxyType
 from typing import Dict
 
 # API Key header configuration
 API_KEY_NAME = "X-API-Key"
 api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=True)
 
+# Client info returned for the default API key (read-only, shared by all requests)
+DEFAULT_CLIENT = MappingProxyType({
+    "client_name": "default",
+    "scopes": ["read", "write"],
+    "rate_limit": 1000  # requests per hour
+})
 
+
+@lru_cache(maxsize=None)
 def get_api_key() -> str:
     """
     Get API key from environment variables
 
+    The key is read on first use (after conf/.env has been loaded) and
+    cached for the life of the process.
+
     Returns:
         str: The API key
 
@@ -65,7 +79,8 @@ async def verify_api_key(api_key: str = Security(api_key_header)) -> Dict[str, a
             detail=str(e)
         )
 
-    if api_key != correct_api_key:
+    # Constant-time comparison so response timing does not leak the key
+    if not hmac.compare_digest(api_key.encode(), correct_api_key.encode()):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid API Key",
@@ -73,11 +88,7 @@ async def verify_api_key(api_key: str = Security(api_key_header)) -> Dict[str, a
         )
 
     # Return client info structure (ready for database-backed expansion)
-    return {
-        "client_name": "default",
-        "scopes": ["read", "write"],
-        "rate_limit": 1000  # requests per hour
-    }
+    return DEFAULT_CLIENT
 
 
 async def verify_api_key_optional(api_key: str = Security(api_key_header)) -> Dict[str, any]:
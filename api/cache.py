@@ -0,0 +1,106 @@
+"""
+API Response Cache
+In-process TTL cache for read-only endpoints whose data only changes on ETL reloads
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+# Cache configuration
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "300"))
+CACHE_MAX_SIZE = int(os.getenv("CACHE_MAX_SIZE", "128"))
+# Shorter TTL for pipeline monitoring data, which changes with every run
+OBSERVABILITY_CACHE_TTL_SECONDS = int(os.getenv("OBSERVABILITY_CACHE_TTL_SECONDS", "30"))
+
+# Keyword arguments that identify the caller rather than the query
+_IGNORED_KWARGS = {"client"}
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a fixed time-to-live
+
+    Args:
+        maxsize: Maximum number of entries kept (least recently used evicted first)
+        ttl: Seconds an entry stays valid
+    """
+
+    def __init__(self, maxsize: int = CACHE_MAX_SIZE, ttl: int = CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return (hit, value) for key"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return False, None
+
+            self._data.move_to_end(key)
+            return True, value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[int] = None):
+        """Store value under key (ttl overrides the cache default)"""
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> int:
+        """Drop all entries, returning how many were removed"""
+        with self._lock:
+            count = len(self._data)
+            self._data.clear()
+            return count
+
+
+response_cache = TTLCache()
+
+
+def cached_response(func: Optional[Callable] = None, *, ttl: Optional[int] = None) -> Callable:
+    """
+    Cache an endpoint's return value keyed on its query parameters
+
+    Exceptions (including HTTPException) are never cached. The client
+    injected by verify_api_key is excluded from the key. Use
+    @cached_response(ttl=...) to override the default TTL.
+
+    Example:
+        @app.get("/health/stats")
+        @cached_response
+        def get_stats(client: dict = Depends(verify_api_key)):
+            ...
+    """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (
+                func.__name__,
+                args,
+                tuple(sorted((k, v) for k, v in kwargs.items() if k not in _IGNORED_KWARGS))
+            )
+
+            hit, value = response_cache.get(key)
+            if hit:
+                return value
+
+            value = func(*args, **kwargs)
+            response_cache.set(key, value, ttl)
+            return value
+
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
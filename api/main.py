@@ -3,28 +3,42 @@ FastAPI application for Uganda Health Pipeline
 Provides REST API access to health sector performance indicators
 """
 
-from fastapi import FastAPI, HTTPException, Query, Depends
+from fastapi import FastAPI, HTTPException, Query, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any
 import psycopg2
-import pandas as pd
+import psycopg2.extensions
+import psycopg2.pool
 import os
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import threading
+import weakref
 from datetime import datetime
-from sqlalchemy import create_engine
+from functools import lru_cache
 from pathlib import Path
 from dotenv import load_dotenv
 from api.auth import verify_api_key
+from api.cache import OBSERVABILITY_CACHE_TTL_SECONDS, cached_response, response_cache
 
 # Load local environment variables if present
 load_dotenv(dotenv_path=Path("conf/.env"))
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI(
     title="Uganda Health API",
     description="REST API for Uganda Health Sector Performance Indicators",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse  # orjson serialises large row lists much faster
 )
 
 # CORS Configuration
@@ -36,9 +50,45 @@ app.add_middleware(
     allow_origins=allowed_origins,  # Set ALLOWED_ORIGINS in .env for production
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
-    allow_headers=["X-API-Key", "Content-Type", "Authorization"],
+    allow_headers=["X-API-Key", "Content-Type", "Authorization", "If-None-Match"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
+# ETag revalidation for read-only data endpoints
+ETAG_PATH_PREFIX = "/health/"
+
+@app.middleware("http")
+async def etag_revalidation(request: Request, call_next):
+    """Answer conditional GETs with 304 Not Modified while the warehouse data is unchanged"""
+    if request.method != "GET" or not request.url.path.startswith(ETAG_PATH_PREFIX):
+        return await call_next(request)
+
+    # The tag names the data version and the URL it was served for, so it is
+    # checked before the endpoint runs: a 304 costs one small query
+    try:
+        version = await run_in_threadpool(get_data_version)
+    except Exception:
+        version = None
+    if version is None:
+        return await call_next(request)
+    tagged = f"{app.version}|{version}|{request.url.path}?{request.url.query}"
+    etag = f'"{hashlib.blake2b(tagged.encode(), digest_size=16).hexdigest()}"'
+
+    api_key = request.headers.get("X-API-Key")
+    if api_key and etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        try:
+            await verify_api_key(api_key)
+        except HTTPException:
+            pass  # the endpoint rejects the caller as usual
+        else:
+            return Response(status_code=304, headers={"ETag": etag})
+
+    response = await call_next(request)
+    if response.status_code == 200:
+        # added to the response's own headers, so repeated ones (Set-Cookie) survive
+        response.headers["ETag"] = etag
+    return response
+
 # Database configuration
 def get_db_config():
     """Get database configuration"""
@@ -84,15 +134,158 @@ class RankingItem(BaseModel):
     category: Optional[str]
     change_from_previous: Optional[float]
 
+# Return NUMERIC columns as float (as pandas did) so they serialize as JSON numbers
+DEC2FLOAT = psycopg2.extensions.new_type(
+    psycopg2.extensions.DECIMAL.values,
+    "DEC2FLOAT",
+    lambda value, cursor: float(value) if value is not None else None
+)
+psycopg2.extensions.register_type(DEC2FLOAT)
+
+# Shared connection pool, created once at startup and reused by every request
+DB_POOL_MIN = 2
+DB_POOL_MAX = 20
+db_pool: Optional[psycopg2.pool.ThreadedConnectionPool] = None
+
+# Endpoints run in FastAPI's threadpool, which has more workers than the pool
+# has connections; callers wait here instead of getting "pool exhausted"
+db_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+db_pool_lock = threading.Lock()
+
+# Prepared statement names already created on each pooled connection
+_prepared_statements: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+def init_db_pool():
+    """Create the psycopg2 connection pool"""
+    global db_pool
+    if db_pool is not None:
+        return
+
+    with db_pool_lock:
+        if db_pool is None:
+            db_pool = psycopg2.pool.ThreadedConnectionPool(minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, **get_db_config())
+
+@app.on_event("startup")
+def open_db_pool():
+    """Open the database pool when the API starts"""
+    try:
+        init_db_pool()
+    except Exception:
+        # Database may not be reachable yet; retried on first request
+        pass
+
+@app.on_event("shutdown")
+def close_db_pool():
+    """Close all pooled database connections"""
+    global db_pool
+    if db_pool is not None:
+        db_pool.closeall()
+        db_pool = None
+
 def get_db_connection():
-    """Create database connection"""
+    """Check out a database connection from the pool"""
+    db_pool_slots.acquire()
     try:
-        return psycopg2.connect(**get_db_config())
+        init_db_pool()
+        conn = db_pool.getconn()
+
+        # Discard connections that were closed while idle (e.g. after a
+        # database restart) instead of handing them to an endpoint
+        while conn.closed:
+            db_pool.putconn(conn, close=True)
+            conn = db_pool.getconn()
+
+        return conn
     except Exception as e:
+        db_pool_slots.release()
         # Don't raise HTTPException during connection creation
         # Let individual endpoints handle connection errors
         raise Exception(f"Database connection failed: {str(e)}")
 
+def release_db_connection(conn):
+    """Return a connection to the pool (rolls back any open transaction)"""
+    try:
+        if db_pool is not None:
+            db_pool.putconn(conn)
+        else:
+            conn.close()
+    finally:
+        db_pool_slots.release()
+
+# Completion time of the last successful warehouse load
+LAST_LOAD_QUERY = """
+SELECT MAX(completed_at) FROM metadata.pipeline_runs
+WHERE pipeline_stage = 'load' AND status = 'success'
+"""
+_data_version = None
+_data_version_lock = threading.Lock()
+
+def get_data_version() -> Optional[str]:
+    """
+    The warehouse data version: when its last successful load finished
+
+    A new version drops this worker's cached responses, so they are never
+    served under it. None when no load has been recorded.
+    """
+    global _data_version
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(LAST_LOAD_QUERY)
+            last_loaded = cursor.fetchone()[0]
+    finally:
+        release_db_connection(conn)
+
+    version = last_loaded.isoformat() if last_loaded else None
+    with _data_version_lock:
+        if version != _data_version:
+            if _data_version is not None:
+                response_cache.clear()
+            _data_version = version
+    return version
+
+def fetch_all_dicts(cursor) -> List[Dict[str, Any]]:
+    """Fetch all rows from an executed cursor as a list of dicts"""
+    columns = [desc[0] for desc in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def encode_page_cursor(sort_key: str, fact_id: int) -> str:
+    """Encode the last row's sort key as an opaque keyset pagination cursor"""
+    return base64.urlsafe_b64encode(json.dumps([sort_key, fact_id]).encode()).decode()
+
+def decode_page_cursor(page_cursor: str) -> tuple:
+    """Decode a cursor from encode_page_cursor() into (sort_key, fact_id)"""
+    try:
+        sort_key, fact_id = json.loads(base64.urlsafe_b64decode(page_cursor.encode()))
+        return str(sort_key), int(fact_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+@lru_cache(maxsize=256)
+def statement_name(query: str) -> str:
+    """Derive a stable prepared statement name from the query text"""
+    return "stmt_" + hashlib.md5(query.encode()).hexdigest()[:16]
+
+def execute_prepared(cursor, query: str, params: tuple):
+    """
+    Execute a query as a server-side prepared statement
+
+    The statement is prepared once per connection (named after a hash of
+    the query text) so repeated calls skip parsing and planning.
+    Placeholders in query use PostgreSQL's $1, $2, ... syntax.
+    """
+    name = statement_name(query)
+    prepared = _prepared_statements.setdefault(cursor.connection, set())
+
+    if name not in prepared:
+        cursor.execute(f"PREPARE {name} AS {query}")
+        prepared.add(name)
+
+    if params:
+        cursor.execute(f"EXECUTE {name}({', '.join(['%s'] * len(params))})", params)
+    else:
+        cursor.execute(f"EXECUTE {name}")
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -112,16 +305,154 @@ async def test_endpoint():
         ]
     }
 
+# SQL fragments for get_indicators sorting; only these constants reach the query text.
+# NULLs coalesce to a key below every real value, so they sort first ascending and
+# the keyset comparison never meets a NULL; each key has a (key, fact_id) index on mv_flat
+SORT_COLUMNS = {
+    "indicator_name": "COALESCE(indicator_name, '')",
+    "period_label": "COALESCE(period_label, '')",
+    "year": "COALESCE(year, -2147483648)",
+    "value": "COALESCE(value, '-Infinity'::numeric)"
+}
+# Sort order -> (ORDER BY direction, keyset comparison operator)
+SORT_ORDERS = {
+    "asc": ("ASC", ">"),
+    "desc": ("DESC", "<")
+}
+
+@lru_cache(maxsize=None)
+def build_indicators_query(
+    has_indicator: bool,
+    has_period: bool,
+    has_year: bool,
+    has_after: bool,
+    sort_by: str,
+    sort_order: str
+) -> str:
+    """
+    Build the get_indicators SQL for one filter/sort combination
+
+    Each combination is built once and reused. Placeholders are numbered in
+    the order get_indicators appends its params: indicator, period, year,
+    the two keyset cursor values, then limit and offset.
+    """
+    sort_column = SORT_COLUMNS[sort_by]
+    direction, comparison = SORT_ORDERS[sort_order]
+
+    # fact_id breaks ties so the sort key is unique for keyset pagination
+    query = f"""
+    SELECT
+        indicator_name,
+        period_label,
+        year,
+        value,
+        {sort_column}::text as sort_key,
+        fact_id
+    FROM health.mv_flat
+    WHERE 1=1
+    """
+    param_count = 0
+
+    if has_indicator:
+        param_count += 1
+        query += f" AND indicator_name ILIKE ${param_count}"
+
+    if has_period:
+        param_count += 1
+        query += f" AND period_label = ${param_count}"
+
+    if has_year:
+        param_count += 1
+        query += f" AND year = ${param_count}"
+
+    # Seek past the previous page along the (sort key, fact_id) index
+    if has_after:
+        param_count += 2
+        query += f" AND ({sort_column}, fact_id) {comparison} (${param_count - 1}, ${param_count})"
+
+    # Add sorting from the whitelisted fragments
+    query += f" ORDER BY {sort_column} {direction}, fact_id {direction}"
+
+    # Add pagination as bound params so every page shares one prepared statement
+    query += f" LIMIT ${param_count + 1} OFFSET ${param_count + 2}"
+
+    return query
+
+@cached_response
+def fetch_indicators_page(limit: int, offset: int, indicator: Optional[str], period: Optional[str],
+                          year: Optional[int], sort_by: str, sort_order: str, after: Optional[str]) -> tuple:
+    """
+    Run get_indicators' query, returning (rows as dicts, next page cursor or None)
+
+    The plain rows are what gets cached; each request builds its own response from them.
+    """
+    page_after = decode_page_cursor(after) if after else None
+    conn = get_db_connection()
+
+    try:
+        params = []
+
+        if indicator:
+            # Escape LIKE wildcards so the filter is a literal substring match
+            pattern = indicator.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{pattern}%")
+
+        if period:
+            params.append(period)
+
+        if year:
+            params.append(year)
+
+        if page_after:
+            params.extend(page_after)
+
+        params.extend([limit, offset])
+
+        query = build_indicators_query(bool(indicator), bool(period), bool(year), bool(page_after), sort_by, sort_order)
+
+        # Lazy %-formatting: nothing is rendered unless DEBUG logging is enabled
+        logger.debug("Query: %s", query)
+        logger.debug("Params: %s", params)
+
+        # Each filter/sort combination is prepared once per pooled connection
+        with conn.cursor() as cursor:
+            execute_prepared(cursor, query, tuple(params))
+            rows = cursor.fetchall()
+
+        results = [
+            {"indicator_name": row[0], "period_label": row[1], "year": row[2], "value": row[3]}
+            for row in rows
+        ]
+
+        logger.debug("Results count: %d", len(results))
+
+        # A full page may have more rows after it
+        next_cursor = None
+        if len(rows) == limit:
+            next_cursor = encode_page_cursor(rows[-1][4], rows[-1][5])
+
+        return results, next_cursor
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
+    finally:
+        release_db_connection(conn)
+
+# Database-backed endpoints are plain `def` so FastAPI runs the blocking
+# psycopg2 calls in its threadpool instead of on the event loop
 @app.get("/health/indicators", response_model=List[HealthIndicator])
-async def get_indicators(
+def get_indicators(
     client: dict = Depends(verify_api_key),
     limit: int = Query(100, description="Maximum number of records to return", ge=1, le=1000),
     offset: int = Query(0, description="Number of records to skip", ge=0),
     indicator: Optional[str] = Query(None, description="Filter by indicator name (partial match)"),
     period: Optional[str] = Query(None, description="Filter by period label"),
     year: Optional[int] = Query(None, description="Filter by year"),
-    sort_by: str = Query("indicator_name", description="Sort field", enum=["indicator_name", "period_label", "year", "value"]),
-    sort_order: str = Query("asc", description="Sort order", enum=["asc", "desc"])
+    sort_by: Literal["indicator_name", "period_label", "year", "value"] = Query("indicator_name", description="Sort field"),
+    sort_order: Literal["asc", "desc"] = Query("asc", description="Sort order"),
+    after: Optional[str] = Query(None, description="Cursor from a previous page's X-Next-Cursor header")
 ):
     """
     Get health indicator data with flexible filtering and sorting options.
@@ -133,83 +464,29 @@ async def get_indicators(
     - **year**: Filter by year
     - **sort_by**: Sort field
     - **sort_order**: Sort direction
+    - **after**: Keyset cursor; returns the rows following the previous page without scanning skipped rows
+
+    When a full page is returned, the `X-Next-Cursor` response header holds the cursor for the next page.
     """
-    # Use SQLAlchemy instead of psycopg2 for pandas compatibility
-    engine = create_engine(
-        f"postgresql+psycopg2://{get_db_config()['user']}:{get_db_config()['password']}@{get_db_config()['host']}:{get_db_config()['port']}/{get_db_config()['database']}"
+    results, next_cursor = fetch_indicators_page(
+        limit=limit, offset=offset, indicator=indicator, period=period, year=year,
+        sort_by=sort_by, sort_order=sort_order, after=after
     )
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
 
-    try:
-        query = """
-        SELECT
-            i.indicator_name,
-            d.period_label,
-            d.year,
-            f.value
-        FROM health.fact_indicator_values f
-        JOIN health.dim_indicator i ON f.indicator_id = i.indicator_id
-        JOIN health.dim_date d ON f.date_id = d.date_id
-        WHERE 1=1
-        """
-
-        params = {}
-
-        if indicator:
-            query += " AND LOWER(i.indicator_name) LIKE LOWER(:indicator)"
-            params['indicator'] = f"%{indicator}%"
-
-        if period:
-            query += " AND d.period_label = :period"
-            params['period'] = period
-
-        if year:
-            query += " AND d.year = :year"
-            params['year'] = year
-
-        # Add sorting
-        if sort_by in ["indicator_name", "period_label", "year", "value"]:
-            query += f" ORDER BY {sort_by} {sort_order.upper()}"
-
-        # Add pagination (inline validated integers to avoid driver issues with bound params)
-        query += f" LIMIT {int(limit)} OFFSET {int(offset)}"
-
-        # Debug: print the query and params
-        print(f"DEBUG: Query: {query}")
-        print(f"DEBUG: Params: {params}")
-
-        df = pd.read_sql(query, engine, params=params)
-        results = df.to_dict('records')
-
-        print(f"DEBUG: Results count: {len(results)}")
-        return results
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
-    finally:
-        # Dispose SQLAlchemy engine to free connections
-        try:
-            engine.dispose()
-        except Exception:
-            pass
+    # Rows come from typed columns, so skip per-row response_model validation;
+    # the model is kept on the route for the OpenAPI schema
+    return ORJSONResponse(content=results, headers=headers)
 
 @app.get("/health/indicators/metadata")
-async def get_indicators_metadata(client: dict = Depends(verify_api_key)):
+@cached_response
+def get_indicators_metadata(client: dict = Depends(verify_api_key)):
     """Get metadata about available indicators"""
     conn = get_db_connection()
 
     try:
-        # Get overall stats
-        total_query = """
-        SELECT
-            COUNT(DISTINCT i.indicator_id) as total_indicators,
-            COUNT(f.fact_id) as total_records
-        FROM health.dim_indicator i
-        LEFT JOIN health.fact_indicator_values f ON i.indicator_id = f.indicator_id
-        """
-
-        total_stats = pd.read_sql(total_query, conn).to_dict('records')[0]
-
-        # Get indicator details
+        # Per-indicator details; overall totals are derived from the same
+        # rows so the endpoint needs a single round trip
         indicator_query = """
         SELECT
             i.indicator_name,
@@ -217,8 +494,9 @@ async def get_indicators_metadata(client: dict = Depends(verify_api_key)):
             COUNT(f.fact_id) as data_points,
             MIN(d.period_label) as first_period,
             MAX(d.period_label) as last_period,
-            MIN(f.value) as min_value,
-            MAX(f.value) as max_value
+            CASE WHEN MIN(f.value) IS NOT NULL
+                THEN ARRAY[MIN(f.value), MAX(f.value)]::float8[]
+            END as value_range
         FROM health.dim_indicator i
         LEFT JOIN health.fact_indicator_values f ON i.indicator_id = f.indicator_id
         LEFT JOIN health.dim_date d ON f.date_id = d.date_id
@@ -226,34 +504,24 @@ async def get_indicators_metadata(client: dict = Depends(verify_api_key)):
         ORDER BY i.indicator_name
         """
 
-        indicators_df = pd.read_sql(indicator_query, conn)
-
-        # Convert to response format
-        indicators = []
-        for _, row in indicators_df.iterrows():
-            indicator = {
-                "indicator_name": row['indicator_name'],
-                "category": row['category'],
-                "data_points": int(row['data_points']),
-                "first_period": row['first_period'],
-                "last_period": row['last_period'],
-                "value_range": [float(row['min_value']), float(row['max_value'])] if pd.notna(row['min_value']) else None
-            }
-            indicators.append(indicator)
+        cursor = conn.cursor()
+        cursor.execute(indicator_query)
+        # Rows are already in response format
+        indicators = fetch_all_dicts(cursor)
 
         return {
-            "total_indicators": total_stats['total_indicators'],
-            "total_records": total_stats['total_records'],
+            "total_indicators": len(indicators),
+            "total_records": sum(row['data_points'] for row in indicators),
             "indicators": indicators
         }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Metadata query failed: {str(e)}")
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 @app.get("/health/indicators/{indicator_name}/timeseries")
-async def get_indicator_timeseries(
+def get_indicator_timeseries(
     indicator_name: str,
     client: dict = Depends(verify_api_key)
 ):
@@ -265,45 +533,44 @@ async def get_indicator_timeseries(
         import urllib.parse
         decoded_name = urllib.parse.unquote(indicator_name)
 
+        # Year-over-year change and the series statistics are computed in SQL;
+        # the statistics are window aggregates repeated on every row
         query = """
         SELECT
-            d.period_label,
+            d.period_label as period,
             d.year,
             f.value,
-            LAG(f.value) OVER (ORDER BY d.year, d.period_label) as prev_value
+            ROUND((f.value - LAG(f.value) OVER w) / NULLIF(LAG(f.value) OVER w, 0) * 100, 2) as change_pct,
+            COUNT(f.value) OVER () as value_count,
+            ROUND(AVG(f.value) OVER (), 2) as avg_value,
+            MIN(f.value) OVER () as min_value,
+            MAX(f.value) OVER () as max_value,
+            FIRST_VALUE(f.value) OVER (ORDER BY f.value IS NULL, d.year, d.period_label, f.fact_id) as first_value,
+            FIRST_VALUE(f.value) OVER (ORDER BY f.value IS NULL, d.year DESC, d.period_label DESC, f.fact_id DESC) as last_value
         FROM health.fact_indicator_values f
         JOIN health.dim_indicator i ON f.indicator_id = i.indicator_id
         JOIN health.dim_date d ON f.date_id = d.date_id
-        WHERE LOWER(i.indicator_name) = LOWER(%s)
-        ORDER BY d.year, d.period_label
+        WHERE LOWER(i.indicator_name) = LOWER($1)
+        WINDOW w AS (ORDER BY d.year, d.period_label, f.fact_id)
+        ORDER BY d.year, d.period_label, f.fact_id
         """
 
-        df = pd.read_sql(query, conn, params=[decoded_name])
+        cursor = conn.cursor()
+        execute_prepared(cursor, query, (decoded_name,))
+        rows = cursor.fetchall()
 
-        if df.empty:
+        if not rows:
             raise HTTPException(status_code=404, detail=f"Indicator '{decoded_name}' not found")
 
-        # Calculate year-over-year changes
-        time_series = []
-        for _, row in df.iterrows():
-            change_pct = None
-            if pd.notna(row['prev_value']) and row['prev_value'] != 0:
-                change_pct = round((row['value'] - row['prev_value']) / row['prev_value'] * 100, 2)
-
-            time_series.append({
-                "period": row['period_label'],
-                "year": int(row['year']),
-                "value": float(row['value']),
-                "change_pct": change_pct
-            })
-
-        # Calculate statistics
-        values = df['value'].dropna()
-        avg_value = float(values.mean()) if not values.empty else 0
+        time_series = [
+            {"period": row[0], "year": row[1], "value": row[2], "change_pct": row[3]}
+            for row in rows
+        ]
+        value_count, avg_value, min_value, max_value, first_value, last_value = rows[0][4:]
 
         # Simple trend analysis
-        if len(values) >= 2:
-            trend = "increasing" if values.iloc[-1] > values.iloc[0] else "decreasing"
+        if value_count >= 2:
+            trend = "increasing" if last_value > first_value else "decreasing"
         else:
             trend = "insufficient_data"
 
@@ -312,80 +579,98 @@ async def get_indicator_timeseries(
             "data_points": len(time_series),
             "time_series": time_series,
             "statistics": {
-                "average": round(avg_value, 2),
-                "min_value": float(values.min()) if not values.empty else 0,
-                "max_value": float(values.max()) if not values.empty else 0,
+                "average": avg_value if avg_value is not None else 0,
+                "min_value": min_value if min_value is not None else 0,
+                "max_value": max_value if max_value is not None else 0,
                 "trend": trend
             }
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
-        if "not found" in str(e):
-            raise
         raise HTTPException(status_code=500, detail=f"Timeseries query failed: {str(e)}")
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 @app.get("/health/rankings/top-performers")
-async def get_top_performers(
+def get_top_performers(
     client: dict = Depends(verify_api_key),
     period: Optional[str] = Query(None, description="Time period to rank (default: latest)"),
     limit: int = Query(10, description="Number of results", ge=1, le=50),
-    metric: str = Query("total_value", description="Ranking metric", enum=["total_value", "avg_value"])
+    metric: Literal["total_value", "avg_value"] = Query("total_value", description="Ranking metric")
 ):
     """Get top-performing indicators for a given period"""
     conn = get_db_connection()
 
     try:
-        # Determine the period to use
-        if not period:
-            # Get the latest period
-            period_query = "SELECT MAX(period_label) FROM health.dim_date"
-            latest_period = pd.read_sql(period_query, conn).iloc[0, 0]
-            period = latest_period
-
         # Build ranking query based on metric
         if metric == "total_value":
-            order_by = "SUM(f.value) DESC"
             value_field = "SUM(f.value)"
         else:  # avg_value
-            order_by = "AVG(f.value) DESC"
             value_field = "AVG(f.value)"
 
+        # Rank and change versus the same indicator in the preceding period are
+        # computed in SQL; the period defaults to the latest one
         query = f"""
-        SELECT
-            i.indicator_name,
-            i.category,
-            {value_field} as value,
-            LAG({value_field}) OVER (ORDER BY {order_by}) as prev_rank_value
-        FROM health.fact_indicator_values f
-        JOIN health.dim_indicator i ON f.indicator_id = i.indicator_id
-        JOIN health.dim_date d ON f.date_id = d.date_id
-        WHERE d.period_label = %s
-        GROUP BY i.indicator_id, i.indicator_name, i.category
-        ORDER BY {order_by}
-        LIMIT %s
+        WITH target AS (
+            SELECT COALESCE($1, MAX(period_label)) as period_label
+            FROM health.dim_date
+        ),
+        previous AS (
+            SELECT MAX(d.period_label) as period_label
+            FROM health.dim_date d
+            JOIN target t ON d.period_label < t.period_label
+        ),
+        totals AS (
+            SELECT f.indicator_id, d.period_label, {value_field} as value
+            FROM health.fact_indicator_values f
+            JOIN health.dim_date d ON f.date_id = d.date_id
+            WHERE d.period_label IN (
+                SELECT period_label FROM target
+                UNION ALL
+                SELECT period_label FROM previous
+            )
+            GROUP BY f.indicator_id, d.period_label
+        ),
+        ranked AS (
+            SELECT
+                ROW_NUMBER() OVER (ORDER BY cur.value DESC) as rank,
+                i.indicator_name,
+                ROUND(cur.value, 2) as value,
+                i.category,
+                ROUND((cur.value - prev.value) / NULLIF(prev.value, 0) * 100, 2) as change_from_previous
+            FROM totals cur
+            JOIN target t ON cur.period_label = t.period_label
+            JOIN health.dim_indicator i ON cur.indicator_id = i.indicator_id
+            CROSS JOIN previous p
+            LEFT JOIN totals prev ON prev.indicator_id = cur.indicator_id AND prev.period_label = p.period_label
+            ORDER BY cur.value DESC
+            LIMIT $2
+        )
+        -- target and previous always have one row each, so the resolved periods
+        -- come back even when nothing ranks (as a single row with no ranking)
+        SELECT t.period_label as period, p.period_label as previous_period, r.*
+        FROM target t
+        CROSS JOIN previous p
+        LEFT JOIN ranked r ON true
+        ORDER BY r.rank
         """
 
-        df = pd.read_sql(query, conn, params=[period, limit])
-
-        # Format response
-        rankings = []
-        for idx, row in df.iterrows():
-            change_pct = None
-            if pd.notna(row['prev_rank_value']) and row['prev_rank_value'] != 0 and idx > 0:
-                change_pct = round((row['value'] - row['prev_rank_value']) / row['prev_rank_value'] * 100, 2)
-
-            rankings.append({
-                "rank": idx + 1,
-                "indicator_name": row['indicator_name'],
-                "value": round(float(row['value']), 2),
-                "category": row['category'],
-                "change_from_previous": change_pct
-            })
+        cursor = conn.cursor()
+        execute_prepared(cursor, query, (period, limit))
+        rows = fetch_all_dicts(cursor)
+
+        # The resolved periods come back on every row; report them once
+        period, previous_period = rows[0]['period'], rows[0]['previous_period']
+        rankings = [
+            {key: value for key, value in row.items() if key not in ('period', 'previous_period')}
+            for row in rows if row['rank'] is not None
+        ]
 
         return {
             "period": period,
+            "previous_period": previous_period,
             "ranking_metric": metric,
             "limit": limit,
             "rankings": rankings
@@ -394,61 +679,54 @@ async def get_top_performers(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ranking query failed: {str(e)}")
     finally:
-        conn.close()
+        release_db_connection(conn)
 
-@app.get("/health/stats")
-async def get_stats(client: dict = Depends(verify_api_key)):
-    """Get overall dataset statistics"""
+@cached_response
+def get_dataset_aggregates() -> Dict[str, Any]:
+    """Read the dataset-wide aggregates shared by the stats and quality endpoints"""
     conn = get_db_connection()
 
     try:
-        query = """
-        SELECT
-            COUNT(f.fact_id) as total_records,
-            COUNT(DISTINCT i.indicator_id) as unique_indicators,
-            COUNT(DISTINCT d.period_label) as unique_periods,
-            ROUND(AVG(f.value), 2) as avg_value,
-            MIN(f.value) as min_value,
-            MAX(f.value) as max_value
-        FROM health.fact_indicator_values f
-        JOIN health.dim_indicator i ON f.indicator_id = i.indicator_id
-        JOIN health.dim_date d ON f.date_id = d.date_id
-        """
+        # Precomputed at the end of each warehouse load, plus when that load finished
+        query = f"SELECT s.*, ({LAST_LOAD_QUERY}) AS last_loaded FROM health.mv_stats s"
 
-        df = pd.read_sql(query, conn)
-        stats = df.to_dict('records')[0]
+        cursor = conn.cursor()
+        cursor.execute(query)
+        return fetch_all_dicts(cursor)[0]
+    finally:
+        release_db_connection(conn)
+
+@app.get("/health/stats")
+@cached_response
+def get_stats(client: dict = Depends(verify_api_key)):
+    """Get overall dataset statistics"""
+    try:
+        aggregates = get_dataset_aggregates()
+        stats = {
+            key: aggregates[key]
+            for key in ["total_records", "unique_indicators", "unique_periods", "avg_value", "min_value", "max_value"]
+        }
 
-        # Add last updated timestamp (simplified)
-        stats['last_updated'] = datetime.now().isoformat()
+        # When the warehouse was last loaded, not when this response was built
+        last_loaded = aggregates['last_loaded']
+        stats['last_updated'] = last_loaded.isoformat() if last_loaded else None
 
         return stats
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Stats query failed: {str(e)}")
-    finally:
-        conn.close()
 
 @app.get("/health/quality/dashboard")
-async def get_quality_dashboard(client: dict = Depends(verify_api_key)):
+@cached_response
+def get_quality_dashboard(client: dict = Depends(verify_api_key)):
     """Get data quality metrics and validation status"""
-    conn = get_db_connection()
-
     try:
         # Basic quality metrics
-        quality_query = """
-        SELECT
-            COUNT(*) as total_records,
-            COUNT(CASE WHEN value IS NULL THEN 1 END) as null_values,
-            COUNT(CASE WHEN value = 0 THEN 1 END) as zero_values,
-            COUNT(CASE WHEN value < 0 THEN 1 END) as negative_values,
-            ROUND(AVG(value), 2) as avg_value,
-            MIN(value) as min_value,
-            MAX(value) as max_value
-        FROM health.fact_indicator_values
-        """
-
-        quality_df = pd.read_sql(quality_query, conn)
-        quality = quality_df.to_dict('records')[0]
+        aggregates = get_dataset_aggregates()
+        quality = {
+            key: aggregates[key]
+            for key in ["total_records", "null_values", "zero_values", "negative_values", "avg_value", "min_value", "max_value"]
+        }
 
         # Calculate quality score (simplified)
         completeness_score = 1.0 if quality['null_values'] == 0 else (1 - quality['null_values'] / quality['total_records'])
@@ -456,7 +734,7 @@ async def get_quality_dashboard(client: dict = Depends(verify_api_key)):
 
         return {
             "overall_quality_score": quality_score,
-            "last_updated": datetime.now().isoformat(),
+            "last_updated": aggregates['last_loaded'].isoformat() if aggregates['last_loaded'] else None,
             "metrics": quality,
             "validation_results": {
                 "table_counts": "PASSED",
@@ -469,17 +747,27 @@ async def get_quality_dashboard(client: dict = Depends(verify_api_key)):
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Quality dashboard query failed: {str(e)}")
-    finally:
-        conn.close()
+
+@app.post("/admin/cache/flush")
+async def flush_cache(client: dict = Depends(verify_api_key)):
+    """Clear cached query results (call after an ETL reload)"""
+    cleared = response_cache.clear()
+    return {
+        "cleared_entries": cleared,
+        "timestamp": datetime.now().isoformat()
+    }
 
 # Health check endpoint
 @app.get("/health")
-async def health_check():
+def health_check():
     """API health check"""
     conn = get_db_connection()
     try:
-        # Simple query to test database connection
-        pd.read_sql("SELECT 1", conn)
+        # Simple query to test database connection (never cached, so it
+        # always reflects the live connection)
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
         return {
             "status": "healthy",
             "database": "connected",
@@ -493,7 +781,7 @@ async def health_check():
             "timestamp": datetime.now().isoformat()
         }
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 
 # =====================================================
@@ -501,7 +789,8 @@ async def health_check():
 # =====================================================
 
 @app.get("/observability/pipeline-health")
-async def get_pipeline_health(client: dict = Depends(verify_api_key)):
+@cached_response(ttl=OBSERVABILITY_CACHE_TTL_SECONDS)
+def get_pipeline_health(client: dict = Depends(verify_api_key)):
     """
     Get pipeline health metrics (last 30 days)
 
@@ -509,8 +798,7 @@ async def get_pipeline_health(client: dict = Depends(verify_api_key)):
     """
     conn = None
     try:
-        db_config = get_db_config()
-        conn = psycopg2.connect(**db_config)
+        conn = get_db_connection()
         cursor = conn.cursor()
 
         cursor.execute("""
@@ -526,10 +814,7 @@ async def get_pipeline_health(client: dict = Depends(verify_api_key)):
             ORDER BY last_run_at DESC
         """)
 
-        columns = [desc[0] for desc in cursor.description]
-        results = []
-        for row in cursor.fetchall():
-            results.append(dict(zip(columns, row)))
+        results = fetch_all_dicts(cursor)
 
         return {
             "pipeline_health": results,
@@ -540,11 +825,11 @@ async def get_pipeline_health(client: dict = Depends(verify_api_key)):
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         if conn:
-            conn.close()
+            release_db_connection(conn)
 
 
 @app.get("/observability/recent-runs")
-async def get_recent_runs(
+def get_recent_runs(
     client: dict = Depends(verify_api_key),
     limit: int = Query(10, ge=1, le=100)
 ):
@@ -555,11 +840,10 @@ async def get_recent_runs(
     """
     conn = None
     try:
-        db_config = get_db_config()
-        conn = psycopg2.connect(**db_config)
+        conn = get_db_connection()
         cursor = conn.cursor()
 
-        cursor.execute("""
+        execute_prepared(cursor, """
             SELECT
                 run_id,
                 pipeline_name,
@@ -575,13 +859,10 @@ async def get_recent_runs(
                 error_message
             FROM metadata.pipeline_runs
             ORDER BY started_at DESC
-            LIMIT %s
+            LIMIT $1
         """, (limit,))
 
-        columns = [desc[0] for desc in cursor.description]
-        results = []
-        for row in cursor.fetchall():
-            results.append(dict(zip(columns, row)))
+        results = fetch_all_dicts(cursor)
 
         return {
             "runs": results,
@@ -593,11 +874,11 @@ async def get_recent_runs(
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         if conn:
-            conn.close()
+            release_db_connection(conn)
 
 
 @app.get("/observability/data-quality")
-async def get_data_quality_metrics(
+def get_data_quality_metrics(
     client: dict = Depends(verify_api_key),
     days: int = Query(7, ge=1, le=90)
 ):
@@ -608,30 +889,26 @@ async def get_data_quality_metrics(
     """
     conn = None
     try:
-        db_config = get_db_config()
-        conn = psycopg2.connect(**db_config)
+        conn = get_db_connection()
         cursor = conn.cursor()
 
         # Overall quality by category
-        cursor.execute("""
+        execute_prepared(cursor, """
             SELECT
                 check_category,
                 COUNT(*) as total_checks,
                 SUM(CASE WHEN passed THEN 1 ELSE 0 END) as passed_checks,
                 ROUND(100.0 * SUM(CASE WHEN passed THEN 1 ELSE 0 END) / COUNT(*), 2) as pass_rate
             FROM metadata.data_quality_metrics
-            WHERE checked_at > NOW() - INTERVAL '%s days'
+            WHERE checked_at > NOW() - $1 * INTERVAL '1 day'
             GROUP BY check_category
             ORDER BY check_category
         """, (days,))
 
-        columns = [desc[0] for desc in cursor.description]
-        quality_by_category = []
-        for row in cursor.fetchall():
-            quality_by_category.append(dict(zip(columns, row)))
+        quality_by_category = fetch_all_dicts(cursor)
 
         # Recent failures
-        cursor.execute("""
+        execute_prepared(cursor, """
             SELECT
                 check_name,
                 check_category,
@@ -642,15 +919,12 @@ async def get_data_quality_metrics(
                 checked_at
             FROM metadata.data_quality_metrics
             WHERE passed = FALSE
-              AND checked_at > NOW() - INTERVAL '%s days'
+              AND checked_at > NOW() - $1 * INTERVAL '1 day'
             ORDER BY checked_at DESC
             LIMIT 20
         """, (days,))
 
-        columns = [desc[0] for desc in cursor.description]
-        failed_checks = []
-        for row in cursor.fetchall():
-            failed_checks.append(dict(zip(columns, row)))
+        failed_checks = fetch_all_dicts(cursor)
 
         return {
             "quality_by_category": quality_by_category,
@@ -663,11 +937,11 @@ async def get_data_quality_metrics(
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         if conn:
-            conn.close()
+            release_db_connection(conn)
 
 
 @app.get("/observability/lineage/{table_name}/{column_name}")
-async def get_field_lineage(
+def get_field_lineage(
     table_name: str,
     column_name: str,
     client: dict = Depends(verify_api_key)
@@ -680,11 +954,10 @@ async def get_field_lineage(
     """
     conn = None
     try:
-        db_config = get_db_config()
-        conn = psycopg2.connect(**db_config)
+        conn = get_db_connection()
         cursor = conn.cursor()
 
-        cursor.execute("""
+        execute_prepared(cursor, """
             SELECT
                 source_file,
                 source_sheet,
@@ -693,16 +966,13 @@ async def get_field_lineage(
                 transformation_type,
                 recorded_at
             FROM metadata.field_lineage
-            WHERE target_table = %s
-              AND target_column = %s
+            WHERE target_table = $1
+              AND target_column = $2
             ORDER BY recorded_at DESC
             LIMIT 50
         """, (table_name, column_name))
 
-        columns = [desc[0] for desc in cursor.description]
-        lineage = []
-        for row in cursor.fetchall():
-            lineage.append(dict(zip(columns, row)))
+        lineage = fetch_all_dicts(cursor)
 
         return {
             "table": table_name,
@@ -716,18 +986,18 @@ async def get_field_lineage(
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         if conn:
-            conn.close()
+            release_db_connection(conn)
 
 
 @app.get("/observability/source-files")
-async def get_source_files(client: dict = Depends(verify_api_key)):
+@cached_response(ttl=OBSERVABILITY_CACHE_TTL_SECONDS)
+def get_source_files(client: dict = Depends(verify_api_key)):
     """
     Get registered source files with processing statistics
     """
     conn = None
     try:
-        db_config = get_db_config()
-        conn = psycopg2.connect(**db_config)
+        conn = get_db_connection()
         cursor = conn.cursor()
 
         cursor.execute("""
@@ -747,10 +1017,7 @@ async def get_source_files(client: dict = Depends(verify_api_key)):
             ORDER BY last_processed DESC NULLS LAST
         """)
 
-        columns = [desc[0] for desc in cursor.description]
-        files = []
-        for row in cursor.fetchall():
-            files.append(dict(zip(columns, row)))
+        files = fetch_all_dicts(cursor)
 
         return {
             "source_files": files,
@@ -762,7 +1029,7 @@ async def get_source_files(client: dict = Depends(verify_api_key)):
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         if conn:
-            conn.close()
+            release_db_connection(conn)
 
 
 @app.get("/observability/dashboard")
@@ -773,11 +1040,14 @@ async def get_monitoring_dashboard(client: dict = Depends(verify_api_key)):
     Returns pipeline health, data quality, and recent activity
     """
     try:
-        # Gather all metrics
-        pipeline_health = await get_pipeline_health()
-        recent_runs = await get_recent_runs(limit=5)
-        data_quality = await get_data_quality_metrics(days=7)
-        source_files = await get_source_files()
+        # Gather all metrics concurrently; each query runs on its own
+        # pooled connection in the threadpool
+        pipeline_health, recent_runs, data_quality, source_files = await asyncio.gather(
+            run_in_threadpool(get_pipeline_health, client=client),
+            run_in_threadpool(get_recent_runs, client=client, limit=5),
+            run_in_threadpool(get_data_quality_metrics, client=client, days=7),
+            run_in_threadpool(get_source_files, client=client)
+        )
 
         return {
             "dashboard": {
@@ -795,4 +1065,16 @@ async def get_monitoring_dashboard(client: dict = Depends(verify_api_key)):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
+
+    # Multiple workers need the app as an import string; reload is for development only.
+    # Each worker holds its own connection pool (up to DB_POOL_MAX connections).
+    reload = os.getenv("API_RELOAD", "false").lower() == "true"
+    uvicorn.run(
+        "api.main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=1 if reload else int(os.getenv("API_WORKERS", str(os.cpu_count() or 1))),
+        reload=reload,
+        loop="auto",  # uvloop when installed (uvicorn[standard])
+        http="auto"   # httptools when installed
+    )
@@ -5,32 +5,240 @@ Supports multiple Excel files for scalable data ingestion
 """
 
 import os
+import re
 import sys
+import csv
+import hashlib
+import json
+import tempfile
+import threading
+import importlib.machinery
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import numpy as np
 import pandas as pd
+import openpyxl
+from openpyxl.cell.cell import ERROR_CODES
+from functools import lru_cache
 from pathlib import Path
 import logging
+from datetime import date, datetime
 
 # Add project root to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from observability import ObservedPipeline, HealthDataValidator
+from observability import ObservedPipeline
+
+# Optional: python-calamine (Rust) reads .xlsx and .xls much faster than
+# openpyxl/xlrd; without it .xlsx goes through openpyxl and .xls through pandas
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
+
+# Optional: pyarrow formats CSV in C++; pandas.to_csv is used without it
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = None
 
 # Configure paths
 SOURCE_DIR = Path("data/source")
 RAW_DIR = Path("data/raw")
 RAW_DIR.mkdir(parents=True, exist_ok=True)
 
+# Sheets of one file are parsed/written concurrently by this many threads
+SHEET_WORKERS = 4
+
+# Output files are written through a large buffer to cut write(2) calls
+WRITE_BUFFER_BYTES = 4 * 1024 * 1024
+
+# Raw landing format: 'csv' (default), or 'parquet'/'feather' to also write a
+# typed binary copy of each sheet next to its CSV (the transform step reads
+# the Feather copy instead of re-parsing the CSV)
+RAW_FORMAT = os.getenv("RAW_FORMAT", "csv").lower()
+
+# Re-extract every file even when its .schema.json sidecar says it is unchanged
+FORCE_INGEST = os.getenv("FORCE_INGEST", "false").lower() == "true"
+
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
+# Anything other than letters, digits, space, underscore or hyphen; one
+# underscore per character so existing output names don't change
+_UNSAFE_CHARS = re.compile(r'[^\w \-]')
+
+
 def sanitize_sheet_name(name: str) -> str:
     """Sanitize sheet name to be filesystem-safe"""
-    return "".join(c if c.isalnum() or c in (" ", "_", "-") else "_" for c in name).strip().replace(" ", "_")
+    return _UNSAFE_CHARS.sub("_", name).strip().replace(" ", "_")
+
+
+@lru_cache(maxsize=128)
+def _fingerprint(path: str, mtime_ns: int, size: int) -> str:
+    """SHA-256 of a file's bytes, memoized on (path, mtime, size)"""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def file_fingerprint(excel_file: Path) -> str:
+    """Content fingerprint of a source file"""
+    stat = excel_file.stat()
+    return _fingerprint(str(excel_file), stat.st_mtime_ns, stat.st_size)
+
+
+def sidecar_path(excel_file: Path) -> Path:
+    """Path of the .schema.json sidecar recording a file's last ingestion"""
+    return RAW_DIR / (sanitize_sheet_name(excel_file.stem) + ".schema.json")
+
+
+def unchanged_since_last_run(excel_file: Path):
+    """
+    Return the sidecar of the last successful ingestion if the file and
+    landing format are unchanged and all its CSVs are still present
+    """
+    try:
+        previous = json.loads(sidecar_path(excel_file).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+
+    if previous.get('raw_format') != RAW_FORMAT:
+        return None
+    # Same mtime and size as last time: trust the recorded fingerprint
+    # instead of re-reading the whole workbook to hash it
+    stat = excel_file.stat()
+    touched = (previous.get('mtime_ns'), previous.get('size')) != (stat.st_mtime_ns, stat.st_size)
+    if touched and previous.get('fingerprint') != file_fingerprint(excel_file):
+        return None
+    outputs = [RAW_DIR / (sanitize_sheet_name(f"{excel_file.stem}_{sheet}") + ".csv")
+               for sheet in previous.get('sheet_names', [])]
+    if not all(p.exists() for p in outputs):
+        return None
+    if touched:
+        # Content is the same; remember the new mtime so the next run skips hashing
+        previous.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        sidecar_path(excel_file).write_text(json.dumps(previous), encoding='utf-8')
+    return previous
+
+
+def xls_sheet_is_empty(xls: pd.ExcelFile, sheet: str) -> bool:
+    """Check an xlrd-backed sheet's row count without building a DataFrame"""
+    book = xls.book
+    return hasattr(book, 'sheet_by_name') and book.sheet_by_name(sheet).nrows == 0
+
+
+def write_frame_csv(df: pd.DataFrame, out_path: Path):
+    """Write a DataFrame to CSV, using pyarrow's writer when available"""
+    if pa is not None:
+        try:
+            table = pa.Table.from_pandas(df.rename(columns=str), preserve_index=False)
+            pacsv.write_csv(table, out_path)
+            return
+        except (pa.ArrowException, ValueError):
+            # Mixed-type object columns have no Arrow type; use pandas
+            pass
+    with open(out_path, 'w', buffering=WRITE_BUFFER_BYTES, newline='', encoding='utf-8') as f:
+        df.to_csv(f, index=False)
+
+
+def write_raw_copy(csv_path: Path):
+    """Write a RAW_FORMAT copy of a raw CSV (types as read_csv infers them)"""
+    df = pd.read_csv(csv_path)
+    if RAW_FORMAT == 'feather':
+        df.to_feather(csv_path.with_suffix('.feather'), compression='lz4')
+    else:
+        df.to_parquet(csv_path.with_suffix('.parquet'), engine='pyarrow', compression='zstd', index=False)
+
+
+def convert_cell(value):
+    """Convert an openpyxl cell value the way pandas.read_excel does"""
+    if isinstance(value, str) and value in ERROR_CODES:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, date) and not isinstance(value, datetime):
+        # calamine returns plain dates for midnight timestamps
+        return datetime(value.year, value.month, value.day)
+    return value
+
+
+# A CalamineWorkbook is not safe to read from several sheet threads at once
+_calamine_lock = threading.Lock()
+
+
+def iter_sheet_rows(workbook, sheet_name: str):
+    """
+    Yield the converted cell values of each row in a sheet
+
+    The workbook is opened once per file, so workbook.xml and the shared
+    strings table are parsed once and reused for every sheet.
+    """
+    if CalamineWorkbook is not None and isinstance(workbook, CalamineWorkbook):
+        with _calamine_lock:
+            raw_rows = workbook.get_sheet_by_name(sheet_name).to_python(skip_empty_area=False)
+    else:
+        raw_rows = workbook[sheet_name].iter_rows(values_only=True)
+
+    for raw_row in raw_rows:
+        yield [convert_cell(v) for v in raw_row]
+
+
+def stream_sheet_to_csv(rows, out_path: Path) -> tuple[int, int, int]:
+    """
+    Write sheet rows to CSV one by one, without building a DataFrame
+
+    Output follows the layout of pd.read_excel(header=None).to_csv(index=False):
+    a header of column positions, rows padded to the widest row, and trailing
+    empty rows dropped. Values are written as stored (no per-column dtype
+    inference), so integral numbers stay integers.
+
+    Returns:
+        Tuple of (rows, columns, null_cells)
+    """
+    row_count = 0
+    col_count = 0
+    filled_cells = 0
+    pending_empty = 0
+
+    # Rows go to a scratch file first because the header needs the final width
+    with tempfile.TemporaryFile('w+', buffering=WRITE_BUFFER_BYTES, newline='', encoding='utf-8') as body:
+        writer = csv.writer(body, lineterminator='\n')
+
+        for row in rows:
+            while row and (row[-1] is None or row[-1] == ''):
+                row.pop()
+
+            if not row:
+                pending_empty += 1
+                continue
 
+            # Empty rows are only kept when data follows them
+            for _ in range(pending_empty):
+                writer.writerow([])
+            row_count += pending_empty + 1
+            pending_empty = 0
 
-def process_excel_file(excel_file: Path, observer: ObservedPipeline) -> tuple[int, int]:
+            writer.writerow(row)
+            col_count = max(col_count, len(row))
+            filled_cells += sum(1 for v in row if v is not None and v != '')
+
+        body.seek(0)
+        with open(out_path, 'w', buffering=WRITE_BUFFER_BYTES, newline='', encoding='utf-8') as out:
+            out_writer = csv.writer(out, lineterminator='\n')
+            out_writer.writerow(range(col_count))
+            for line in csv.reader(body):
+                out_writer.writerow(line + [''] * (col_count - len(line)))
+
+    return row_count, col_count, row_count * col_count - filled_cells
+
+
+def process_excel_file(excel_file: Path, observer: ObservedPipeline) -> tuple[int, int, list]:
     """
     Process a single Excel file and extract all sheets to CSV
 
@@ -39,25 +247,37 @@ def process_excel_file(excel_file: Path, observer: ObservedPipeline) -> tuple[in
         observer: ObservedPipeline instance for tracking
 
     Returns:
-        Tuple of (total_rows, sheets_processed)
+        Tuple of (total_rows, sheets_processed, sheet_names)
     """
-    logger.info(f"\n{'='*70}")
-    logger.info(f"Processing: {excel_file.name}")
-    logger.info(f"{'='*70}")
+    logger.info("\n%s", '=' * 70)
+    logger.info("Processing: %s", excel_file.name)
+    logger.info("%s", '=' * 70)
+
+    # Read Excel file; sheets are streamed straight to CSV from calamine or
+    # a read-only openpyxl workbook, .xls without calamine goes through pandas
+    is_xlsx = excel_file.suffix.lower() == '.xlsx'
+    streamed = CalamineWorkbook is not None or is_xlsx
+    if CalamineWorkbook is not None:
+        workbook = CalamineWorkbook.from_path(str(excel_file))
+        sheet_names = workbook.sheet_names
+    elif is_xlsx:
+        workbook = openpyxl.load_workbook(excel_file, read_only=True, data_only=True, keep_links=False)
+        sheet_names = workbook.sheetnames
+    else:
+        xls = pd.ExcelFile(excel_file)
+        sheet_names = xls.sheet_names
 
-    # Read Excel file
-    xls = pd.ExcelFile(excel_file)
     schema_info = {
-        'sheet_names': xls.sheet_names,
-        'sheet_count': len(xls.sheet_names)
+        'sheet_names': sheet_names,
+        'sheet_count': len(sheet_names)
     }
 
-    logger.info(f"Found {len(xls.sheet_names)} sheets: {', '.join(xls.sheet_names)}")
+    logger.info("Found %d sheets: %s", len(sheet_names), ', '.join(sheet_names))
 
     # Register source file
     file_id = observer.register_source_file(
         file_path=str(excel_file),
-        sheet_count=len(xls.sheet_names),
+        sheet_count=len(sheet_names),
         schema_fingerprint=schema_info
     )
 
@@ -65,61 +285,153 @@ def process_excel_file(excel_file: Path, observer: ObservedPipeline) -> tuple[in
     sheets_processed = 0
     file_stem = excel_file.stem  # Filename without extension
 
-    # Process each sheet
-    for sheet in xls.sheet_names:
-        try:
+    def _emit_sheet(sheet: str) -> tuple[str, int, int, int]:
+        """Write one sheet to CSV, returning (out_name, rows, columns, null_cells)"""
+        # Create unique CSV name: filename_sheetname.csv
+        # This prevents conflicts when multiple files have sheets with same names
+        out_name = sanitize_sheet_name(f"{file_stem}_{sheet}") + ".csv"
+        out_path = RAW_DIR / out_name
+
+        # Write CSV
+        if streamed:
+            row_count, col_count, null_cells = stream_sheet_to_csv(iter_sheet_rows(workbook, sheet), out_path)
+        elif xls_sheet_is_empty(xls, sheet):
+            # Cover/notes tabs: same empty CSV read_excel would give, without the read
+            out_path.write_text('\n', encoding='utf-8')
+            row_count, col_count, null_cells = 0, 0, 0
+        else:
             df = pd.read_excel(xls, sheet_name=sheet, header=None)
+            write_frame_csv(df, out_path)
+            row_count, col_count = df.shape
+            # One pass over the values, no intermediate per-column sums
+            null_cells = int(np.count_nonzero(pd.isna(df.to_numpy(copy=False))))
+
+        if RAW_FORMAT in ('parquet', 'feather') and row_count > 0:
+            write_raw_copy(out_path)
+        return out_name, row_count, col_count, null_cells
+
+    # Lineage and quality records are buffered and written once per file
+    lineage_batch = []
+    quality_batch = []
+
+    # Sheets are parsed and written on worker threads so one sheet's parse
+    # overlaps the previous one's disk write; results are collected here
+    # in sheet order
+    with ThreadPoolExecutor(max_workers=SHEET_WORKERS) as executor:
+        futures = [(sheet, executor.submit(_emit_sheet, sheet)) for sheet in sheet_names]
+
+        for sheet, future in futures:
+            try:
+                out_name, row_count, col_count, null_cells = future.result()
+                logger.info("  ✓ Sheet '%s' -> %s (%d rows × %d cols)", sheet, out_name, row_count, col_count)
+
+                # Track lineage for this sheet
+                lineage_batch.append({
+                    'target_table': 'raw_csv',
+                    'target_column': 'all_columns',
+                    'source_file': str(excel_file),
+                    'source_sheet': sheet,
+                    'source_column': 'all_columns',
+                    'transformation_logic': f'Direct extraction from Excel file {excel_file.name}, sheet {sheet} to CSV',
+                    'transformation_type': 'direct_copy'
+                })
+
+                # Basic data quality check on raw data: completeness
+                if row_count > 0 and col_count > 0:
+                    null_pct = null_cells / (row_count * col_count)
+                    quality_batch.append({
+                        'check_name': f'raw_completeness_{file_stem}_{sheet}',
+                        'passed': null_pct < 0.5,  # Raw data can have more nulls
+                        'check_category': 'completeness',
+                        'table_name': f'raw_{file_stem}_{sheet}',
+                        'metric_value': 1 - null_pct,
+                        'threshold_value': 0.5,
+                        'row_count': row_count,
+                        'details': {
+                            'source_file': excel_file.name,
+                            'sheet_name': sheet,
+                            'columns': col_count
+                        }
+                    })
+
+                total_rows += row_count
+                sheets_processed += 1
+
+            except Exception as e:
+                logger.error("  ✗ Failed to process sheet '%s': %s", sheet, e)
+                # Continue processing other sheets
+                continue
+
+    observer.track_lineage_bulk(lineage_batch)
+    observer.log_quality_check_bulk(quality_batch)
+
+    if streamed and hasattr(workbook, 'close'):
+        workbook.close()  # read-only workbooks keep the file handle open
+
+    return total_rows, sheets_processed, sheet_names
+
+
+def _process_one(excel_file: Path) -> tuple[int, int, bool, str]:
+    """
+    Ingest one Excel file under its own pipeline run (runs in a worker process)
+
+    Returns:
+        Tuple of (total_rows, sheets_processed, succeeded, error_message)
+    """
+    stat = excel_file.stat()
+    fingerprint = file_fingerprint(excel_file)
 
-            # Create unique CSV name: filename_sheetname.csv
-            # This prevents conflicts when multiple files have sheets with same names
-            out_name = sanitize_sheet_name(f"{file_stem}_{sheet}") + ".csv"
-            out_path = RAW_DIR / out_name
-
-            # Write CSV
-            df.to_csv(out_path, index=False, encoding='utf-8')
-            logger.info(f"  ✓ Sheet '{sheet}' -> {out_name} ({len(df)} rows × {len(df.columns)} cols)")
-
-            # Track lineage for this sheet
-            observer.track_lineage(
-                target_table='raw_csv',
-                target_column='all_columns',
-                source_file=str(excel_file),
-                source_sheet=sheet,
-                source_column='all_columns',
-                transformation_logic=f'Direct extraction from Excel file {excel_file.name}, sheet {sheet} to CSV',
-                transformation_type='direct_copy'
+    # Use ObservedPipeline context manager for automatic tracking
+    # Each file gets its own pipeline run for better observability
+    with ObservedPipeline('uganda_health_etl', 'ingestion', str(excel_file)) as observer:
+        try:
+            total_rows, sheets_processed, sheet_names = process_excel_file(excel_file, observer)
+
+            # Complete run with statistics
+            observer.complete_run(
+                status='success',
+                records_input=total_rows,
+                records_processed=total_rows,
+                records_loaded=total_rows
             )
 
-            # Basic data quality check on raw data
-            validator = HealthDataValidator(observer)
-
-            # Check completeness
-            if len(df) > 0 and len(df.columns) > 0:
-                null_pct = df.isnull().sum().sum() / (len(df) * len(df.columns))
-                observer.log_quality_check(
-                    check_name=f'raw_completeness_{file_stem}_{sheet}',
-                    passed=null_pct < 0.5,  # Raw data can have more nulls
-                    check_category='completeness',
-                    table_name=f'raw_{file_stem}_{sheet}',
-                    metric_value=1 - null_pct,
-                    threshold_value=0.5,
-                    row_count=len(df),
-                    details={
-                        'source_file': excel_file.name,
-                        'sheet_name': sheet,
-                        'columns': len(df.columns)
-                    }
-                )
-
-            total_rows += len(df)
-            sheets_processed += 1
+            # Only a complete extraction may be skipped next time
+            if sheets_processed == len(sheet_names):
+                sidecar_path(excel_file).write_text(json.dumps({
+                    'fingerprint': fingerprint,
+                    'mtime_ns': stat.st_mtime_ns,
+                    'size': stat.st_size,
+                    'raw_format': RAW_FORMAT,
+                    'sheet_names': sheet_names,
+                    'total_rows': total_rows
+                }), encoding='utf-8')
+
+            logger.info("✓ %s: %d sheets, %s rows", excel_file.name, sheets_processed, f"{total_rows:,}")
+            return total_rows, sheets_processed, True, ''
 
         except Exception as e:
-            logger.error(f"  ✗ Failed to process sheet '{sheet}': {str(e)}")
-            # Continue processing other sheets
-            continue
+            logger.error("✗ Failed to process %s: %s", excel_file.name, e)
+            observer.complete_run(
+                status='failed',
+                records_input=0,
+                records_processed=0,
+                records_loaded=0,
+                error_message=str(e)
+            )
+            return 0, 0, False, str(e)
 
-    return total_rows, sheets_processed
+
+def _worker_importable() -> bool:
+    """
+    Whether worker processes can find _process_one
+
+    Forked workers inherit this module and spawned ones re-run __main__,
+    but a spawned worker can't import it under the name run_pipeline.py
+    loads it as (ingestion_load_excel) - the file name isn't importable.
+    """
+    if __name__ == "__main__" or multiprocessing.get_start_method() == "fork":
+        return True
+    return importlib.machinery.PathFinder.find_spec(__name__.partition(".")[0], sys.path) is not None
 
 
 def main():
@@ -138,9 +450,12 @@ def main():
             f"Please place .xlsx or .xls files in the data/source/ directory."
         )
 
-    logger.info(f"Found {len(excel_files)} Excel file(s) to process:")
+    if RAW_FORMAT in ('parquet', 'feather') and pa is None:
+        raise ImportError(f"RAW_FORMAT={RAW_FORMAT} requires pyarrow (pip install pyarrow)")
+
+    logger.info("Found %d Excel file(s) to process:", len(excel_files))
     for f in excel_files:
-        logger.info(f"  • {f.name}")
+        logger.info("  • %s", f.name)
 
     # Process all files
     grand_total_rows = 0
@@ -148,54 +463,58 @@ def main():
     files_processed = 0
     files_failed = 0
 
+    # Skip files whose content hasn't changed since their last full ingestion,
+    # before any worker process is started
+    pending = []
     for excel_file in excel_files:
-        # Use ObservedPipeline context manager for automatic tracking
-        # Each file gets its own pipeline run for better observability
-        with ObservedPipeline('uganda_health_etl', 'ingestion', str(excel_file)) as observer:
+        previous = None if FORCE_INGEST else unchanged_since_last_run(excel_file)
+        if previous is None:
+            pending.append(excel_file)
+            continue
+        logger.info("= %s: unchanged since last ingestion, skipping", excel_file.name)
+        grand_total_rows += previous['total_rows']
+        grand_total_sheets += len(previous['sheet_names'])
+        files_processed += 1
+
+    # Files are independent and parsing is CPU-bound, so each one runs in
+    # its own process (on threads when worker processes couldn't import us)
+    max_workers = max(1, min(len(pending), os.cpu_count() or 1))
+    pool = ProcessPoolExecutor if _worker_importable() else ThreadPoolExecutor
+    if pool is ThreadPoolExecutor:
+        logger.info("Worker processes can't import %s; processing files on threads", __name__)
+    with pool(max_workers=max_workers) as executor:
+        futures = {executor.submit(_process_one, f): f for f in pending}
+
+        for future in as_completed(futures):
+            excel_file = futures[future]
             try:
-                total_rows, sheets_processed = process_excel_file(excel_file, observer)
-
-                # Complete run with statistics
-                observer.complete_run(
-                    status='success',
-                    records_input=total_rows,
-                    records_processed=total_rows,
-                    records_loaded=total_rows
-                )
+                total_rows, sheets_processed, ok, _ = future.result()
+            except Exception as e:
+                # Worker died before it could record the run
+                logger.error("✗ Failed to process %s: %s", excel_file.name, e)
+                ok = False
 
+            if ok:
                 grand_total_rows += total_rows
                 grand_total_sheets += sheets_processed
                 files_processed += 1
-
-                logger.info(f"✓ {excel_file.name}: {sheets_processed} sheets, {total_rows:,} rows")
-
-            except Exception as e:
-                logger.error(f"✗ Failed to process {excel_file.name}: {str(e)}")
-                observer.complete_run(
-                    status='failed',
-                    records_input=0,
-                    records_processed=0,
-                    records_loaded=0,
-                    error_message=str(e)
-                )
+            else:
                 files_failed += 1
-                # Continue processing other files
-                continue
 
     # Final summary
     logger.info("")
     logger.info("="*70)
     logger.info("INGESTION SUMMARY")
     logger.info("="*70)
-    logger.info(f"Files Processed:    {files_processed}/{len(excel_files)}")
-    logger.info(f"Files Failed:       {files_failed}")
-    logger.info(f"Total Sheets:       {grand_total_sheets}")
-    logger.info(f"Total Rows:         {grand_total_rows:,}")
-    logger.info(f"Output Directory:   {RAW_DIR.absolute()}")
+    logger.info("Files Processed:    %d/%d", files_processed, len(excel_files))
+    logger.info("Files Failed:       %d", files_failed)
+    logger.info("Total Sheets:       %d", grand_total_sheets)
+    logger.info("Total Rows:         %s", f"{grand_total_rows:,}")
+    logger.info("Output Directory:   %s", RAW_DIR.absolute())
     logger.info("="*70)
 
     if files_failed > 0:
-        logger.warning(f"⚠ {files_failed} file(s) failed to process. Check logs above for details.")
+        logger.warning("⚠ %d file(s) failed to process. Check logs above for details.", files_failed)
 
     if files_processed == 0:
         raise RuntimeError("All files failed to process. Ingestion unsuccessful.")
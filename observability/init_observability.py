@@ -36,8 +36,9 @@ def init_observability_schema():
     print(f"Read schema SQL ({len(schema_sql)} characters)")
 
     try:
+        # Plain DDL script: send it straight to the driver, skipping bind-parameter parsing
         with ENGINE.begin() as conn:
-            conn.execute(text(schema_sql))
+            conn.execution_options(no_parameters=True).exec_driver_sql(schema_sql)
 
         print("[SUCCESS] Observability schema created successfully!")
 
@@ -5,10 +5,15 @@ Command-line dashboard for pipeline monitoring
 
 import os
 import sys
+import time
+import json
+import hashlib
+import tempfile
+from decimal import Decimal
 from pathlib import Path
-from datetime import datetime, timedelta
-import pandas as pd
+from datetime import date, datetime, timedelta
 from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection
 from dotenv import load_dotenv
 
 load_dotenv(dotenv_path=Path("conf/.env"))
@@ -19,19 +24,106 @@ PG_USER = os.getenv("PG_USER", "postgres")
 PG_PASSWORD = os.getenv("PG_PASSWORD", "password")
 PG_DB = os.getenv("PG_DB", "uganda_health")
 
+# One pooled engine for every dashboard section, so each query reuses
+# an open connection instead of reconnecting
 ENGINE = create_engine(
     f"postgresql+psycopg2://{PG_USER}:{PG_PASSWORD}@{PG_HOST}:{PG_PORT}/{PG_DB}",
+    pool_size=10,
+    max_overflow=20,
+    pool_pre_ping=True,
+    pool_recycle=1800,
     echo=False
 )
 
+# Query results are reused across CLI invocations for this many seconds
+# (same setting as the API's observability cache; 0 disables it)
+CACHE_TTL_SECONDS = int(os.getenv("OBSERVABILITY_CACHE_TTL_SECONDS", "30"))
+CACHE_DIR = Path(os.getenv("DASHBOARD_CACHE_DIR", Path.home() / ".cache" / "moh-dashboard"))
+
+
+def _encode_cached(value):
+    """json.dump default: tag the column types JSON has no literal for"""
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"__decimal__": str(value)}
+    if isinstance(value, timedelta):
+        return {"__timedelta__": value.total_seconds()}
+    return str(value)
+
+
+def _decode_cached(obj):
+    """json.load object_hook: turn tagged values back into their Python types"""
+    if len(obj) == 1:
+        tag, value = next(iter(obj.items()))
+        if tag == "__datetime__":
+            return datetime.fromisoformat(value)
+        if tag == "__date__":
+            return date.fromisoformat(value)
+        if tag == "__decimal__":
+            return Decimal(value)
+        if tag == "__timedelta__":
+            return timedelta(seconds=value)
+    return obj
+
 
 class MonitoringDashboard:
     """
     Display pipeline health metrics and recent activity
     """
 
-    def __init__(self, engine=None):
-        self.engine = engine or ENGINE
+    def __init__(self, engine=None, use_cache=True):
+        # Either an Engine or an open Connection
+        self.engine = engine if engine is not None else ENGINE
+        self.use_cache = use_cache and CACHE_TTL_SECONDS > 0
+        # When set, sections collect their lines here instead of writing them
+        self._buffer = None
+
+    def _emit(self, lines):
+        """Write a section's lines in one go (or collect them for the full dashboard)"""
+        if self._buffer is not None:
+            self._buffer.extend(lines)
+        else:
+            sys.stdout.write("\n".join(lines) + "\n")
+
+    def _fetch(self, query, params=None):
+        """Run a query and return its rows as dicts, via the on-disk cache"""
+        params = params or {}
+        cache_path = None
+
+        if self.use_cache:
+            # Key on the database too (password left out), so dashboards
+            # pointed at different warehouses never share results
+            database = self.engine.engine.url.render_as_string(hide_password=True)
+            key = hashlib.blake2b(repr((database, query, sorted(params.items()))).encode(), digest_size=16)
+            cache_path = CACHE_DIR / f"{key.hexdigest()}.json"
+            try:
+                if time.time() - cache_path.stat().st_mtime < CACHE_TTL_SECONDS:
+                    with open(cache_path, encoding="utf-8") as f:
+                        return json.load(f, object_hook=_decode_cached)
+            except (OSError, ValueError):
+                pass
+
+        if isinstance(self.engine, Connection):
+            rows = self.engine.execute(text(query), params).mappings().all()
+        else:
+            with self.engine.connect() as conn:
+                rows = conn.execute(text(query), params).mappings().all()
+        rows = [dict(row) for row in rows]
+
+        if cache_path is not None:
+            try:
+                CACHE_DIR.mkdir(parents=True, exist_ok=True)
+                # Write then rename, so a concurrent reader never sees a partial file
+                with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=CACHE_DIR, delete=False) as tmp:
+                    json.dump(rows, tmp, default=_encode_cached)
+                os.replace(tmp.name, cache_path)
+            except OSError:
+                pass
+
+        return rows
 
     def show_recent_runs(self, limit=10):
         """Show recent pipeline runs"""
@@ -50,25 +142,27 @@ class MonitoringDashboard:
         LIMIT :limit
         """
 
-        df = pd.read_sql(text(query), self.engine, params={"limit": limit})
+        rows = self._fetch(query, {"limit": limit})
 
-        print("\n" + "="*100)
-        print("RECENT PIPELINE RUNS")
-        print("="*100)
+        out = []
+        out.append("\n" + "="*100)
+        out.append("RECENT PIPELINE RUNS")
+        out.append("="*100)
 
-        if df.empty:
-            print("No pipeline runs found.")
-            return
+        if not rows:
+            out.append("No pipeline runs found.")
+            return self._emit(out)
 
-        for _, row in df.iterrows():
+        for row in rows:
             status_icon = "[OK]" if row['status'] == 'success' else "[FAIL]"
-            print(f"{status_icon} {row['pipeline_name']}/{row['pipeline_stage']}")
-            print(f"   ID: {row['run_id']}")
-            print(f"   Started: {row['started_at']}")
-            print(f"   Duration: {row['duration_sec']:.1f}s")
-            print(f"   Records: {row['records_processed']} processed -> {row['records_loaded']} loaded")
-            print(f"   Status: {row['status']}")
-            print()
+            out.append(f"{status_icon} {row['pipeline_name']}/{row['pipeline_stage']}")
+            out.append(f"   ID: {row['run_id']}")
+            out.append(f"   Started: {row['started_at']}")
+            out.append(f"   Duration: {row['duration_sec']:.1f}s")
+            out.append(f"   Records: {row['records_processed']} processed -> {row['records_loaded']} loaded")
+            out.append(f"   Status: {row['status']}")
+            out.append("")
+        self._emit(out)
 
     def show_pipeline_health(self):
         """Show pipeline success rates"""
@@ -77,33 +171,35 @@ class MonitoringDashboard:
         ORDER BY last_run_at DESC
         """
 
-        df = pd.read_sql(query, self.engine)
+        rows = self._fetch(query)
 
-        print("\n" + "="*100)
-        print("PIPELINE HEALTH (Last 30 Days)")
-        print("="*100)
+        out = []
+        out.append("\n" + "="*100)
+        out.append("PIPELINE HEALTH (Last 30 Days)")
+        out.append("="*100)
 
-        if df.empty:
-            print("No pipeline health data available.")
-            return
+        if not rows:
+            out.append("No pipeline health data available.")
+            return self._emit(out)
 
-        print(f"{'Pipeline':<30} {'Runs':<8} {'Success':^10} {'Failed':^10} {'Success Rate':^15} {'Avg Duration':^15}")
-        print("-" * 100)
+        out.append(f"{'Pipeline':<30} {'Runs':<8} {'Success':^10} {'Failed':^10} {'Success Rate':^15} {'Avg Duration':^15}")
+        out.append("-" * 100)
 
-        for _, row in df.iterrows():
-            success_rate = row['success_rate'] if pd.notna(row['success_rate']) else 0
-            avg_duration = row['avg_duration_seconds'] if pd.notna(row['avg_duration_seconds']) else 0
+        for row in rows:
+            success_rate = row['success_rate'] if row['success_rate'] is not None else 0
+            avg_duration = row['avg_duration_seconds'] if row['avg_duration_seconds'] is not None else 0
 
             status_indicator = "[OK]" if success_rate >= 95 else "[WARN]" if success_rate >= 80 else "[FAIL]"
 
-            print(f"{row['pipeline_name']:<30} "
+            out.append(f"{row['pipeline_name']:<30} "
                   f"{row['total_runs']:<8} "
                   f"{row['successful_runs']:^10} "
                   f"{row['failed_runs']:^10} "
                   f"{status_indicator} {success_rate:>5.1f}%       "
                   f"{avg_duration:>6.1f}s")
 
-        print()
+        out.append("")
+        self._emit(out)
 
     def show_data_quality_summary(self):
         """Show data quality metrics"""
@@ -119,66 +215,81 @@ class MonitoringDashboard:
         ORDER BY check_category
         """
 
-        df = pd.read_sql(query, self.engine)
+        rows = self._fetch(query)
 
-        print("\n" + "="*100)
-        print("DATA QUALITY SUMMARY (Last 7 Days)")
-        print("="*100)
+        out = []
+        out.append("\n" + "="*100)
+        out.append("DATA QUALITY SUMMARY (Last 7 Days)")
+        out.append("="*100)
 
-        if df.empty:
-            print("No quality checks recorded.")
-            return
+        if not rows:
+            out.append("No quality checks recorded.")
+            return self._emit(out)
 
-        print(f"{'Category':<20} {'Total Checks':^15} {'Passed':^15} {'Pass Rate':^15}")
-        print("-" * 100)
+        out.append(f"{'Category':<20} {'Total Checks':^15} {'Passed':^15} {'Pass Rate':^15}")
+        out.append("-" * 100)
 
-        for _, row in df.iterrows():
-            pass_rate = row['pass_rate'] if pd.notna(row['pass_rate']) else 0
+        for row in rows:
+            pass_rate = row['pass_rate'] if row['pass_rate'] is not None else 0
             status = "[OK]" if pass_rate >= 95 else "[WARN]" if pass_rate >= 80 else "[FAIL]"
 
-            print(f"{row['check_category']:<20} "
+            out.append(f"{row['check_category']:<20} "
                   f"{row['total_checks']:^15} "
                   f"{row['passed_checks']:^15} "
                   f"{status} {pass_rate:>6.1f}%")
 
-        print()
+        out.append("")
+        self._emit(out)
 
     def show_failed_quality_checks(self, limit=10):
         """Show recent failed quality checks"""
         query = """
-        SELECT * FROM metadata.v_failed_quality_checks
+        SELECT
+            check_name,
+            check_category,
+            table_name,
+            column_name,
+            metric_value,
+            threshold_value,
+            source_file,
+            checked_at,
+            details
+        FROM metadata.v_failed_quality_checks
         LIMIT :limit
         """
 
-        df = pd.read_sql(text(query), self.engine, params={"limit": limit})
-
-        print("\n" + "="*100)
-        print(f"RECENT FAILED QUALITY CHECKS (Top {limit})")
-        print("="*100)
-
-        if df.empty:
-            print("[OK] No failed quality checks!")
-            return
-
-        for _, row in df.iterrows():
-            print(f"[FAIL] {row['check_name']} ({row['check_category']})")
-            print(f"   Table: {row['table_name']}")
-            if pd.notna(row['column_name']):
-                print(f"   Column: {row['column_name']}")
-            print(f"   Metric: {row['metric_value']} (threshold: {row['threshold_value']})")
-            print(f"   Source: {row['source_file']}")
-            print(f"   Time: {row['checked_at']}")
-            if pd.notna(row['details']):
-                print(f"   Details: {row['details']}")
-            print()
+        rows = self._fetch(query, {"limit": limit})
+
+        out = []
+        out.append("\n" + "="*100)
+        out.append(f"RECENT FAILED QUALITY CHECKS (Top {limit})")
+        out.append("="*100)
+
+        if not rows:
+            out.append("[OK] No failed quality checks!")
+            return self._emit(out)
+
+        for row in rows:
+            out.append(f"[FAIL] {row['check_name']} ({row['check_category']})")
+            out.append(f"   Table: {row['table_name']}")
+            if row['column_name'] is not None:
+                out.append(f"   Column: {row['column_name']}")
+            out.append(f"   Metric: {row['metric_value']} (threshold: {row['threshold_value']})")
+            out.append(f"   Source: {row['source_file']}")
+            out.append(f"   Time: {row['checked_at']}")
+            if row['details'] is not None:
+                out.append(f"   Details: {row['details']}")
+            out.append("")
+        self._emit(out)
 
     def show_lineage(self, table_name, column_name=None):
         """Show field lineage for a table/column"""
         if column_name:
             query = """
-            SELECT * FROM metadata.get_field_lineage(:table, :column)
+            SELECT source_file, source_column, transformation_logic
+            FROM metadata.get_field_lineage(:table, :column)
             """
-            df = pd.read_sql(text(query), self.engine, params={"table": table_name, "column": column_name})
+            rows = self._fetch(query, {"table": table_name, "column": column_name})
             title = f"LINEAGE: {table_name}.{column_name}"
         else:
             query = """
@@ -192,26 +303,28 @@ class MonitoringDashboard:
             WHERE target_table = :table
             ORDER BY target_column
             """
-            df = pd.read_sql(text(query), self.engine, params={"table": table_name})
+            rows = self._fetch(query, {"table": table_name})
             title = f"LINEAGE: {table_name} (all columns)"
 
-        print("\n" + "="*100)
-        print(title)
-        print("="*100)
+        out = []
+        out.append("\n" + "="*100)
+        out.append(title)
+        out.append("="*100)
 
-        if df.empty:
-            print("No lineage information found.")
-            return
+        if not rows:
+            out.append("No lineage information found.")
+            return self._emit(out)
 
-        for _, row in df.iterrows():
+        for row in rows:
             if 'target_column' in row:
-                print(f"\nColumn: {row['target_column']}")
-            print(f"  Source: {row['source_file']} -> {row['source_column']}")
+                out.append(f"\nColumn: {row['target_column']}")
+            out.append(f"  Source: {row['source_file']} -> {row['source_column']}")
             if 'transformation_type' in row:
-                print(f"  Type: {row['transformation_type']}")
-            print(f"  Logic: {row['transformation_logic']}")
+                out.append(f"  Type: {row['transformation_type']}")
+            out.append(f"  Logic: {row['transformation_logic']}")
 
-        print()
+        out.append("")
+        self._emit(out)
 
     def show_source_files(self):
         """Show registered source files"""
@@ -228,46 +341,63 @@ class MonitoringDashboard:
         ORDER BY last_processed DESC NULLS LAST
         """
 
-        df = pd.read_sql(query, self.engine)
+        rows = self._fetch(query)
 
-        print("\n" + "="*100)
-        print("SOURCE FILES")
-        print("="*100)
+        out = []
+        out.append("\n" + "="*100)
+        out.append("SOURCE FILES")
+        out.append("="*100)
 
-        if df.empty:
-            print("No source files registered.")
-            return
+        if not rows:
+            out.append("No source files registered.")
+            return self._emit(out)
 
-        for _, row in df.iterrows():
+        for row in rows:
             status_icon = "[OK]" if row['status'] == 'processed' else "[FAIL]" if row['status'] == 'failed' else "[PENDING]"
-            print(f"{status_icon} {row['file_name']}")
-            print(f"   Sheets: {row['sheet_count']}, Rows: {row['row_count']}")
-            print(f"   Processed: {row['processing_count']} times")
-            print(f"   First seen: {row['first_seen']}")
-            print(f"   Last processed: {row['last_processed']}")
-            print()
+            out.append(f"{status_icon} {row['file_name']}")
+            out.append(f"   Sheets: {row['sheet_count']}, Rows: {row['row_count']}")
+            out.append(f"   Processed: {row['processing_count']} times")
+            out.append(f"   First seen: {row['first_seen']}")
+            out.append(f"   Last processed: {row['last_processed']}")
+            out.append("")
+        self._emit(out)
 
     def show_full_dashboard(self):
         """Show complete dashboard"""
-        print("\n" + "="*100)
-        print(" "*30 + "UGANDA HEALTH ETL PIPELINE DASHBOARD")
-        print("="*100)
-        print(f"\nGenerated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-
-        self.show_pipeline_health()
-        self.show_data_quality_summary()
-        self.show_recent_runs(limit=5)
-        self.show_failed_quality_checks(limit=5)
-        self.show_source_files()
-
-        print("\n" + "="*100)
-        print("For detailed lineage, run: python observability/monitor_dashboard.py lineage <table_name> [column_name]")
-        print("="*100 + "\n")
+        out = [
+            "\n" + "="*100,
+            " "*30 + "UGANDA HEALTH ETL PIPELINE DASHBOARD",
+            "="*100,
+            f"\nGenerated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        ]
+
+        # Run every section on one checked-out connection rather than
+        # one pool checkout (and pre-ping round-trip) per query, and
+        # collect their output so the whole dashboard is written once
+        with self.engine.connect() as conn:
+            sections = MonitoringDashboard(conn, use_cache=self.use_cache)
+            sections._buffer = out
+            sections.show_pipeline_health()
+            sections.show_data_quality_summary()
+            sections.show_recent_runs(limit=5)
+            sections.show_failed_quality_checks(limit=5)
+            sections.show_source_files()
+
+        out.extend([
+            "\n" + "="*100,
+            "For detailed lineage, run: python observability/monitor_dashboard.py lineage <table_name> [column_name]",
+            "="*100 + "\n"
+        ])
+        self._emit(out)
 
 
 def main():
     """CLI interface for monitoring dashboard"""
-    dashboard = MonitoringDashboard()
+    # --no-cache always queries the database
+    use_cache = '--no-cache' not in sys.argv
+    sys.argv = [arg for arg in sys.argv if arg != '--no-cache']
+
+    dashboard = MonitoringDashboard(use_cache=use_cache)
 
     if len(sys.argv) == 1:
         # No arguments - show full dashboard
@@ -304,6 +434,7 @@ def main():
         print("  runs [N]      - Show recent N pipeline runs")
         print("  lineage <table> [column] - Show data lineage")
         print("  files         - Show source files")
+        print("\nAdd --no-cache to bypass the cached results")
 
 
 if __name__ == "__main__":
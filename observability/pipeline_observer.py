@@ -4,8 +4,10 @@ Tracks pipeline execution, data quality, and lineage
 """
 
 import os
+import math
 import hashlib
 import json
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import Optional, Dict, Any, List
@@ -16,6 +18,77 @@ from dotenv import load_dotenv
 
 load_dotenv(dotenv_path=Path("conf/.env"))
 
+# Connection pool settings for the shared engine
+POOL_SETTINGS = {
+    "pool_size": 10,
+    "max_overflow": 20,
+    "pool_pre_ping": True,
+    "pool_recycle": 1800
+}
+
+# Buffered quality/lineage rows are written early once this many pile up
+BUFFER_FLUSH_ROWS = 1000
+
+_QUALITY_INSERT = text("""
+    INSERT INTO metadata.data_quality_metrics
+    (run_id, check_name, check_category, table_name, column_name,
+     passed, metric_value, threshold_value, row_count, failure_count, details)
+    VALUES (:run_id, :check, :category, :table, :column,
+            :passed, :metric, :threshold, :rows, :failures, :details)
+""")
+
+_LINEAGE_INSERT = text("""
+    INSERT INTO metadata.field_lineage
+    (run_id, target_table, target_column, source_file, source_sheet,
+     source_column, transformation_logic, transformation_type)
+    VALUES (:run_id, :table, :col, :file, :sheet, :src_col, :logic, :type)
+""")
+
+_shared_engine = None
+
+_shared_engine_pid = None
+
+
+def get_shared_engine():
+    """
+    Pooled engine shared by every observer in this process
+
+    Created lazily and re-created after a fork, so worker processes
+    never reuse connections inherited from their parent.
+    """
+    global _shared_engine, _shared_engine_pid
+
+    if _shared_engine is None or _shared_engine_pid != os.getpid():
+        PG_HOST = os.getenv("PG_HOST", "localhost")
+        PG_PORT = os.getenv("PG_PORT", "5432")
+        PG_USER = os.getenv("PG_USER", "postgres")
+        PG_PASSWORD = os.getenv("PG_PASSWORD", "password")
+        PG_DB = os.getenv("PG_DB", "uganda_health")
+
+        _shared_engine = create_engine(
+            f"postgresql+psycopg2://{PG_USER}:{PG_PASSWORD}@{PG_HOST}:{PG_PORT}/{PG_DB}",
+            echo=False,
+            # text() INSERTs don't qualify for insertmanyvalues; without this
+            # psycopg2 sends a buffered executemany one row per round-trip
+            executemany_mode="values_plus_batch",
+            executemany_batch_page_size=BUFFER_FLUSH_ROWS,
+            **POOL_SETTINGS
+        )
+        _shared_engine_pid = os.getpid()
+
+    return _shared_engine
+
+
+def _finite_json(value: Any) -> Any:
+    """Replace NaN/Infinity (not valid JSON for Postgres) with None, recursively"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {k: _finite_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite_json(v) for v in value]
+    return value
+
 
 class PipelineObserver:
     """
@@ -26,27 +99,56 @@ class PipelineObserver:
     - Data quality metrics logging
     - Field lineage tracking
     - Source file registration
+
+    Quality checks and lineage records are buffered in memory and written
+    in one transaction by complete_run() (or flush()).
     """
 
     def __init__(self, db_engine=None):
-        """Initialize with database connection"""
-        if db_engine is None:
-            PG_HOST = os.getenv("PG_HOST", "localhost")
-            PG_PORT = os.getenv("PG_PORT", "5432")
-            PG_USER = os.getenv("PG_USER", "postgres")
-            PG_PASSWORD = os.getenv("PG_PASSWORD", "password")
-            PG_DB = os.getenv("PG_DB", "uganda_health")
-
-            db_engine = create_engine(
-                f"postgresql+psycopg2://{PG_USER}:{PG_PASSWORD}@{PG_HOST}:{PG_PORT}/{PG_DB}",
-                echo=False
-            )
-
-        self.engine = db_engine
+        """Initialize with database connection (the shared pooled engine by default)"""
+        self.engine = db_engine if db_engine is not None else get_shared_engine()
         self.run_id = None
         self.started_at = None
         self.pipeline_name = None
         self.pipeline_stage = None
+        self._quality_buffer: List[Dict[str, Any]] = []
+        self._lineage_buffer: List[Dict[str, Any]] = []
+        # validators log from worker threads; guards both buffers
+        self._buffer_lock = threading.Lock()
+
+    def _take_buffers(self):
+        """Swap both buffers for empty lists, returning the old (quality, lineage) rows"""
+        with self._buffer_lock:
+            quality, lineage = self._quality_buffer, self._lineage_buffer
+            self._quality_buffer, self._lineage_buffer = [], []
+        return quality, lineage
+
+    def _restore_buffers(self, quality, lineage):
+        """Put rows taken by _take_buffers back after a failed write"""
+        with self._buffer_lock:
+            self._quality_buffer[:0] = quality
+            self._lineage_buffer[:0] = lineage
+
+    @staticmethod
+    def _write_rows(conn, quality, lineage):
+        """Insert quality/lineage rows on an open transaction"""
+        if quality:
+            conn.execute(_QUALITY_INSERT, quality)
+        if lineage:
+            conn.execute(_LINEAGE_INSERT, lineage)
+
+    def flush(self):
+        """Write buffered quality checks and lineage records now"""
+        quality, lineage = self._take_buffers()
+        if not quality and not lineage:
+            return
+
+        try:
+            with self.engine.begin() as conn:
+                self._write_rows(conn, quality, lineage)
+        except Exception:
+            self._restore_buffers(quality, lineage)
+            raise
 
     def start_run(
         self,
@@ -116,32 +218,39 @@ class PipelineObserver:
         completed_at = datetime.now()
         duration = (completed_at - self.started_at).total_seconds()
 
-        with self.engine.begin() as conn:
-            conn.execute(text("""
-                UPDATE metadata.pipeline_runs
-                SET
-                    status = :status,
-                    completed_at = :completed,
-                    records_input = :input,
-                    records_processed = :processed,
-                    records_loaded = :loaded,
-                    records_rejected = :rejected,
-                    execution_duration_seconds = :duration,
-                    error_message = :error,
-                    error_details = :details
-                WHERE run_id = :run_id
-            """), {
-                "run_id": self.run_id,
-                "status": status,
-                "completed": completed_at,
-                "input": records_input,
-                "processed": records_processed,
-                "loaded": records_loaded,
-                "rejected": records_rejected,
-                "duration": duration,
-                "error": error_message,
-                "details": json.dumps(error_details) if error_details else None
-            })
+        # Buffered quality/lineage rows go in the same transaction
+        quality, lineage = self._take_buffers()
+        try:
+            with self.engine.begin() as conn:
+                self._write_rows(conn, quality, lineage)
+                conn.execute(text("""
+                    UPDATE metadata.pipeline_runs
+                    SET
+                        status = :status,
+                        completed_at = :completed,
+                        records_input = :input,
+                        records_processed = :processed,
+                        records_loaded = :loaded,
+                        records_rejected = :rejected,
+                        execution_duration_seconds = :duration,
+                        error_message = :error,
+                        error_details = :details
+                    WHERE run_id = :run_id
+                """), {
+                    "run_id": self.run_id,
+                    "status": status,
+                    "completed": completed_at,
+                    "input": records_input,
+                    "processed": records_processed,
+                    "loaded": records_loaded,
+                    "rejected": records_rejected,
+                    "duration": duration,
+                    "error": error_message,
+                    "details": json.dumps(error_details) if error_details else None
+                })
+        except Exception:
+            self._restore_buffers(quality, lineage)
+            raise
 
         status_icon = "[SUCCESS]" if status == 'success' else "[FAILED]"
         print(f"[OBSERVABILITY] {status_icon} Run {self.run_id} completed: {status} ({duration:.2f}s)")
@@ -177,32 +286,55 @@ class PipelineObserver:
             failure_count: Number of rows that failed
             details: Additional context
         """
+        self.log_quality_check_bulk([{
+            'check_name': check_name,
+            'passed': passed,
+            'check_category': check_category,
+            'table_name': table_name,
+            'column_name': column_name,
+            'metric_value': metric_value,
+            'threshold_value': threshold_value,
+            'row_count': row_count,
+            'failure_count': failure_count,
+            'details': details
+        }])
+
+    def log_quality_check_bulk(self, checks: List[Dict[str, Any]]):
+        """
+        Buffer several data quality check results (written on complete_run/flush)
+
+        Args:
+            checks: One dict per check, with log_quality_check's keyword arguments
+        """
         if not self.run_id:
             raise ValueError("No active run. Call start_run() first.")
+        if not checks:
+            return
 
-        with self.engine.begin() as conn:
-            conn.execute(text("""
-                INSERT INTO metadata.data_quality_metrics
-                (run_id, check_name, check_category, table_name, column_name,
-                 passed, metric_value, threshold_value, row_count, failure_count, details)
-                VALUES (:run_id, :check, :category, :table, :column,
-                        :passed, :metric, :threshold, :rows, :failures, :details)
-            """), {
-                "run_id": self.run_id,
-                "check": check_name,
-                "category": check_category,
-                "table": table_name,
-                "column": column_name,
-                "passed": bool(passed),  # Convert numpy.bool_ to Python bool
-                "metric": float(metric_value) if metric_value is not None else None,
-                "threshold": float(threshold_value) if threshold_value is not None else None,
-                "rows": int(row_count) if row_count is not None else None,
-                "failures": int(failure_count) if failure_count is not None else None,
-                "details": json.dumps(details) if details else None
-            })
-
-        status = "[PASS]" if passed else "[FAIL]"
-        print(f"[QUALITY] {status} - {check_name}: {metric_value}")
+        params = [{
+            "run_id": self.run_id,
+            "check": c['check_name'],
+            "category": c.get('check_category', 'general'),
+            "table": c.get('table_name'),
+            "column": c.get('column_name'),
+            "passed": bool(c['passed']),  # Convert numpy.bool_ to Python bool
+            "metric": float(c['metric_value']) if c.get('metric_value') is not None else None,
+            "threshold": float(c['threshold_value']) if c.get('threshold_value') is not None else None,
+            "rows": int(c['row_count']) if c.get('row_count') is not None else None,
+            "failures": int(c['failure_count']) if c.get('failure_count') is not None else None,
+            # A NaN here would otherwise fail the whole buffered write at complete_run
+            "details": json.dumps(_finite_json(c['details'])) if c.get('details') else None
+        } for c in checks]
+
+        with self._buffer_lock:
+            self._quality_buffer.extend(params)
+            full = len(self._quality_buffer) >= BUFFER_FLUSH_ROWS
+        if full:
+            self.flush()
+
+        for c in checks:
+            status = "[PASS]" if c['passed'] else "[FAIL]"
+            print(f"[QUALITY] {status} - {c['check_name']}: {c.get('metric_value')}")
 
     def track_lineage(
         self,
@@ -226,25 +358,44 @@ class PipelineObserver:
             transformation_type: 'direct_copy', 'unpivot', 'aggregate', 'derived'
             source_sheet: Sheet name in Excel (if applicable)
         """
+        self.track_lineage_bulk([{
+            'target_table': target_table,
+            'target_column': target_column,
+            'source_file': source_file,
+            'source_column': source_column,
+            'transformation_logic': transformation_logic,
+            'transformation_type': transformation_type,
+            'source_sheet': source_sheet
+        }])
+
+    def track_lineage_bulk(self, records: List[Dict[str, Any]]):
+        """
+        Buffer several field-level lineage records (written on complete_run/flush)
+
+        Args:
+            records: One dict per record, with track_lineage's keyword arguments
+        """
         if not self.run_id:
             raise ValueError("No active run. Call start_run() first.")
+        if not records:
+            return
 
-        with self.engine.begin() as conn:
-            conn.execute(text("""
-                INSERT INTO metadata.field_lineage
-                (run_id, target_table, target_column, source_file, source_sheet,
-                 source_column, transformation_logic, transformation_type)
-                VALUES (:run_id, :table, :col, :file, :sheet, :src_col, :logic, :type)
-            """), {
-                "run_id": self.run_id,
-                "table": target_table,
-                "col": target_column,
-                "file": source_file,
-                "sheet": source_sheet,
-                "src_col": source_column,
-                "logic": transformation_logic,
-                "type": transformation_type
-            })
+        params = [{
+            "run_id": self.run_id,
+            "table": r['target_table'],
+            "col": r['target_column'],
+            "file": r['source_file'],
+            "sheet": r.get('source_sheet'),
+            "src_col": r['source_column'],
+            "logic": r['transformation_logic'],
+            "type": r.get('transformation_type', 'direct_copy')
+        } for r in records]
+
+        with self._buffer_lock:
+            self._lineage_buffer.extend(params)
+            full = len(self._lineage_buffer) >= BUFFER_FLUSH_ROWS
+        if full:
+            self.flush()
 
     def register_source_file(
         self,
@@ -268,29 +419,43 @@ class PipelineObserver:
             file_id: Database ID of registered file
         """
         path = Path(file_path)
-        file_hash = self._compute_file_hash(path)
-        file_size = path.stat().st_size if path.exists() else None
+        try:
+            stat = path.stat()
+            file_size = stat.st_size
+            file_fingerprint = f"{stat.st_mtime_ns}:{stat.st_size}"
+        except FileNotFoundError:
+            file_size = file_fingerprint = None
 
         with self.engine.begin() as conn:
             # Check if file already exists
             result = conn.execute(text("""
-                SELECT file_id, file_hash
+                SELECT file_id, file_hash, file_fingerprint
                 FROM metadata.source_files
                 WHERE file_path = :path
             """), {"path": str(file_path)})
 
             existing = result.fetchone()
 
+            # Same mtime and size as last time: trust the stored hash
+            # instead of reading the whole file again
+            if existing and file_fingerprint is not None and existing[2] == file_fingerprint:
+                file_hash = existing[1]
+            elif file_fingerprint is None:
+                file_hash = "file_not_found"
+            else:
+                file_hash = self._compute_file_hash(path)
+
             if existing:
-                file_id, existing_hash = existing
+                file_id, existing_hash, _ = existing
                 if existing_hash == file_hash:
                     # File unchanged - update last_processed
                     conn.execute(text("""
                         UPDATE metadata.source_files
                         SET last_processed = NOW(),
-                            processing_count = processing_count + 1
+                            processing_count = processing_count + 1,
+                            file_fingerprint = :fingerprint
                         WHERE file_id = :id
-                    """), {"id": file_id})
+                    """), {"id": file_id, "fingerprint": file_fingerprint})
                     print(f"[OBSERVABILITY] File unchanged: {path.name}")
                     return file_id
                 else:
@@ -298,6 +463,7 @@ class PipelineObserver:
                     conn.execute(text("""
                         UPDATE metadata.source_files
                         SET file_hash = :hash,
+                            file_fingerprint = :fingerprint,
                             file_size_bytes = :size,
                             last_processed = NOW(),
                             processing_count = processing_count + 1,
@@ -309,6 +475,7 @@ class PipelineObserver:
                     """), {
                         "id": file_id,
                         "hash": file_hash,
+                        "fingerprint": file_fingerprint,
                         "size": file_size,
                         "schema": json.dumps(schema_fingerprint) if schema_fingerprint else None,
                         "rows": row_count,
@@ -321,14 +488,15 @@ class PipelineObserver:
                 # New file - insert
                 result = conn.execute(text("""
                     INSERT INTO metadata.source_files
-                    (file_path, file_name, file_hash, file_size_bytes,
+                    (file_path, file_name, file_hash, file_fingerprint, file_size_bytes,
                      sheet_count, row_count, column_count, schema_fingerprint, status)
-                    VALUES (:path, :name, :hash, :size, :sheets, :rows, :cols, :schema, 'processed')
+                    VALUES (:path, :name, :hash, :fingerprint, :size, :sheets, :rows, :cols, :schema, 'processed')
                     RETURNING file_id
                 """), {
                     "path": str(file_path),
                     "name": path.name,
                     "hash": file_hash,
+                    "fingerprint": file_fingerprint,
                     "size": file_size,
                     "sheets": sheet_count,
                     "rows": row_count,
@@ -340,21 +508,24 @@ class PipelineObserver:
                 return file_id
 
     def _compute_file_hash(self, file_path: Path) -> str:
-        """Compute MD5 hash of file for change detection"""
-        if not file_path.exists():
+        """Compute SHA-256 hash of file for change detection"""
+        # SHA-256 is hardware-accelerated in OpenSSL on current CPUs;
+        # 1 MiB reads keep the syscall count low on large workbooks
+        sha256_hash = hashlib.sha256()
+        try:
+            with open(file_path, "rb") as f:
+                while chunk := f.read(1 << 20):
+                    sha256_hash.update(chunk)
+        except FileNotFoundError:
             return "file_not_found"
-
-        md5_hash = hashlib.md5()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                md5_hash.update(chunk)
-        return md5_hash.hexdigest()
+        return sha256_hash.hexdigest()
 
     def get_quality_score(self) -> Optional[float]:
         """Get data quality score for current run (0-100)"""
         if not self.run_id:
             return None
 
+        self.flush()
         with self.engine.connect() as conn:
             result = conn.execute(text("""
                 SELECT metadata.get_quality_score(:run_id)
@@ -367,24 +538,30 @@ class PipelineObserver:
             print("[OBSERVABILITY] No active run")
             return
 
+        self.flush()
         with self.engine.connect() as conn:
-            # Get run details
+            # Run details, per-category quality checks and overall score in one round-trip
             run = conn.execute(text("""
-                SELECT pipeline_name, pipeline_stage, status,
-                       records_processed, records_loaded, records_rejected,
-                       execution_duration_seconds
-                FROM metadata.pipeline_runs
-                WHERE run_id = :run_id
+                SELECT pr.pipeline_name, pr.pipeline_stage, pr.status,
+                       pr.records_processed, pr.records_loaded, pr.records_rejected,
+                       pr.execution_duration_seconds,
+                       (
+                           SELECT json_agg(json_build_array(q.check_category, q.total, q.passed))
+                           FROM (
+                               SELECT check_category, COUNT(*) as total,
+                                      SUM(CASE WHEN passed THEN 1 ELSE 0 END) as passed
+                               FROM metadata.data_quality_metrics
+                               WHERE run_id = pr.run_id
+                               GROUP BY check_category
+                           ) q
+                       ) AS quality,
+                       metadata.get_quality_score(pr.run_id) AS quality_score
+                FROM metadata.pipeline_runs pr
+                WHERE pr.run_id = :run_id
             """), {"run_id": self.run_id}).fetchone()
 
-            # Get quality checks
-            quality = conn.execute(text("""
-                SELECT check_category, COUNT(*) as total,
-                       SUM(CASE WHEN passed THEN 1 ELSE 0 END) as passed
-                FROM metadata.data_quality_metrics
-                WHERE run_id = :run_id
-                GROUP BY check_category
-            """), {"run_id": self.run_id}).fetchall()
+        quality = run[7] or []
+        quality_score = run[8]
 
         print("\n" + "="*60)
         print(f"PIPELINE RUN SUMMARY: {self.run_id}")
@@ -400,7 +577,6 @@ class PipelineObserver:
                 pct = (passed / total * 100) if total > 0 else 0
                 print(f"  {category}: {passed}/{total} passed ({pct:.1f}%)")
 
-        quality_score = self.get_quality_score()
         if quality_score is not None:
             print(f"\nOverall Quality Score: {quality_score:.1f}/100")
 
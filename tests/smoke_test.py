@@ -3,14 +3,37 @@ tests/smoke_test.py
 Basic smoke tests to verify the pipeline ran successfully
 """
 
+import importlib.util
 import os
 import sys
+from functools import lru_cache
 from pathlib import Path
 from dotenv import load_dotenv
 
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+# pyarrow's multithreaded CSV parser when installed, pandas' C parser otherwise
+CSV_ENGINE = "pyarrow" if importlib.util.find_spec("pyarrow") else "c"
+
+@lru_cache(maxsize=1)
+def get_engine():
+    """One pooled engine shared by all database tests"""
+    from sqlalchemy import create_engine
+    load_dotenv(dotenv_path=Path("conf/.env"))
+
+    PG_HOST = os.getenv("PG_HOST", "localhost")
+    PG_PORT = os.getenv("PG_PORT", "5432")
+    PG_USER = os.getenv("PG_USER", "postgres")
+    PG_PASSWORD = os.getenv("PG_PASSWORD", "password")
+    PG_DB = os.getenv("PG_DB", "uganda_health")
+
+    return create_engine(
+        f"postgresql+psycopg2://{PG_USER}:{PG_PASSWORD}@{PG_HOST}:{PG_PORT}/{PG_DB}",
+        echo=False,
+        pool_pre_ping=True
+    )
+
 def test_raw_files_exist():
     """Check that raw CSV files were created"""
     raw_dir = Path("data/raw")
@@ -54,7 +77,7 @@ def test_clean_data_structure():
     
     for csv_file in clean_dir.glob("*_clean.csv"):
         try:
-            df = pd.read_csv(csv_file)
+            df = pd.read_csv(csv_file, engine=CSV_ENGINE)
             if df.empty:
                 print(f"⚠️  WARN: {csv_file.name} is empty")
                 continue
@@ -83,19 +106,8 @@ def test_clean_data_structure():
 def test_database_connection():
     """Test connection to PostgreSQL"""
     try:
-        from sqlalchemy import create_engine, text
-        load_dotenv(dotenv_path=Path("conf/.env"))
-        
-        PG_HOST = os.getenv("PG_HOST", "localhost")
-        PG_PORT = os.getenv("PG_PORT", "5432")
-        PG_USER = os.getenv("PG_USER", "postgres")
-        PG_PASSWORD = os.getenv("PG_PASSWORD", "password")
-        PG_DB = os.getenv("PG_DB", "uganda_health")
-        
-        engine = create_engine(
-            f"postgresql+psycopg2://{PG_USER}:{PG_PASSWORD}@{PG_HOST}:{PG_PORT}/{PG_DB}",
-            echo=False
-        )
+        from sqlalchemy import text
+        engine = get_engine()
         
         with engine.connect() as conn:
             result = conn.execute(text("SELECT 1"))
@@ -111,19 +123,8 @@ def test_database_connection():
 def test_schema_exists():
     """Check that the health schema and tables exist"""
     try:
-        from sqlalchemy import create_engine, text, inspect
-        load_dotenv(dotenv_path=Path("conf/.env"))
-        
-        PG_HOST = os.getenv("PG_HOST", "localhost")
-        PG_PORT = os.getenv("PG_PORT", "5432")
-        PG_USER = os.getenv("PG_USER", "postgres")
-        PG_PASSWORD = os.getenv("PG_PASSWORD", "password")
-        PG_DB = os.getenv("PG_DB", "uganda_health")
-        
-        engine = create_engine(
-            f"postgresql+psycopg2://{PG_USER}:{PG_PASSWORD}@{PG_HOST}:{PG_PORT}/{PG_DB}",
-            echo=False
-        )
+        from sqlalchemy import inspect
+        engine = get_engine()
         
         inspector = inspect(engine)
         schemas = inspector.get_schema_names()
@@ -153,37 +154,27 @@ def test_schema_exists():
 def test_data_loaded():
     """Check that data was loaded into warehouse tables"""
     try:
-        from sqlalchemy import create_engine, text
-        load_dotenv(dotenv_path=Path("conf/.env"))
-        
-        PG_HOST = os.getenv("PG_HOST", "localhost")
-        PG_PORT = os.getenv("PG_PORT", "5432")
-        PG_USER = os.getenv("PG_USER", "postgres")
-        PG_PASSWORD = os.getenv("PG_PASSWORD", "password")
-        PG_DB = os.getenv("PG_DB", "uganda_health")
-        
-        engine = create_engine(
-            f"postgresql+psycopg2://{PG_USER}:{PG_PASSWORD}@{PG_HOST}:{PG_PORT}/{PG_DB}",
-            echo=False
-        )
+        from sqlalchemy import text
+        engine = get_engine()
         
         tables_to_check = [
-            ('health.dim_indicator', 'indicator_id'),
-            ('health.dim_date', 'date_id'),
-            ('health.fact_indicator_values', 'fact_id')
+            'health.dim_indicator',
+            'health.dim_date',
+            'health.fact_indicator_values'
         ]
         
+        # All counts in one round-trip
+        counts_sql = "SELECT " + ", ".join(f"(SELECT COUNT(*) FROM {table})" for table in tables_to_check)
+        with engine.connect() as conn:
+            counts = conn.execute(text(counts_sql)).fetchone()
+        
         all_passed = True
-        for table, id_col in tables_to_check:
-            with engine.connect() as conn:
-                result = conn.execute(text(f"SELECT COUNT(*) as cnt FROM {table}"))
-                count = result.fetchone()[0]
-                
-                if count > 0:
-                    print(f"[OK] PASS: {table} has {count} row(s)")
-                else:
-                    print(f"⚠️  WARN: {table} is empty")
-                    all_passed = False
+        for table, count in zip(tables_to_check, counts):
+            if count > 0:
+                print(f"[OK] PASS: {table} has {count} row(s)")
+            else:
+                print(f"⚠️  WARN: {table} is empty")
+                all_passed = False
         
         return all_passed
         
@@ -191,6 +182,109 @@ def test_data_loaded():
         print(f"[FAIL] FAIL: Data load check failed: {e}")
         return False
 
+def test_transform_chunking():
+    """Chunked and unchunked transforms of a sheet with title rows agree"""
+    import csv
+    import tempfile
+    spec = importlib.util.spec_from_file_location(
+        "clean_and_unpivot", Path(__file__).parent.parent / "transform" / "clean_and_unpivot.py"
+    )
+    transform = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(transform)
+
+    years = ["2016/17", "2017/18", "2018/19"]
+    with tempfile.TemporaryDirectory() as tmp:
+        # Title rows above the year header; the last year only has data further down
+        sheet = Path(tmp) / "chunking.csv"
+        with open(sheet, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Ministry of Health", "", "", ""])
+            writer.writerow(["Annual sector performance", "", "", ""])
+            writer.writerow(["", "", "", ""])
+            writer.writerow(["Indicator"] + years)
+            for i in range(40):
+                writer.writerow([f"Indicator {i}", i, f"{i},000", i if i > 25 else ""])
+
+        outputs = {}
+        for chunk_rows in (2, 10**9):
+            transform.RAW_CHUNK_ROWS = chunk_rows
+            outputs[chunk_rows], _ = transform.process_file(sheet)
+
+    chunked, whole = outputs[2], outputs[10**9]
+    if not chunked.equals(whole):
+        print("[FAIL] FAIL: Chunked transform differs from the unchunked one")
+        print(f"   chunked:\n{chunked.head()}\n   unchunked:\n{whole.head()}")
+        return False
+    if sorted(whole["year_label"].unique()) != years or len(whole) != 40 + 40 + 14:
+        print(f"[FAIL] FAIL: Year header not detected: {sorted(whole['year_label'].unique())}, {len(whole)} rows")
+        return False
+
+    print(f"[OK] PASS: Chunked and unchunked transforms agree ({len(whole)} rows)")
+    return True
+
+def get_api():
+    """The API under test and the headers that authenticate against it"""
+    from fastapi.testclient import TestClient
+    from api.auth import get_api_key
+    from api.main import app
+
+    return TestClient(app), {"X-API-Key": get_api_key()}
+
+def test_rankings_empty_period():
+    """Rankings report the period they resolved even when nothing ranks in it"""
+    from sqlalchemy import text
+    engine = get_engine()
+    # A period with no facts that sorts after every real one, so it is the default
+    empty_period = "zz-smoke-test"
+
+    try:
+        client, headers = get_api()
+        with engine.begin() as conn:
+            latest = conn.execute(text("SELECT MAX(period_label) FROM health.dim_date")).scalar()
+            conn.execute(text("INSERT INTO health.dim_date (period_label) VALUES (:p)"), {"p": empty_period})
+
+        for params in ({}, {"period": empty_period}):
+            response = client.get("/health/rankings/top-performers", params=params, headers=headers)
+            body = response.json()
+            if (response.status_code != 200 or body.get("period") != empty_period
+                    or body.get("previous_period") != latest or body.get("rankings") != []):
+                print(f"[FAIL] FAIL: rankings for an empty period {params or '(default)'} returned {body}")
+                return False
+
+        print(f"[OK] PASS: Empty period resolved to {empty_period!r} with no rankings")
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] FAIL: Rankings check failed: {e}")
+        return False
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM health.dim_date WHERE period_label = :p"), {"p": empty_period})
+
+def test_rankings_without_previous_period():
+    """The earliest period ranks with no previous period to compare against"""
+    try:
+        from sqlalchemy import text
+        with get_engine().connect() as conn:
+            earliest = conn.execute(text("SELECT MIN(period_label) FROM health.dim_date")).scalar()
+
+        client, headers = get_api()
+        response = client.get("/health/rankings/top-performers", params={"period": earliest}, headers=headers)
+        body = response.json()
+        if response.status_code != 200 or body.get("period") != earliest or body.get("previous_period") is not None:
+            print(f"[FAIL] FAIL: rankings for the earliest period returned {body}")
+            return False
+        if any(row["change_from_previous"] is not None for row in body["rankings"]):
+            print(f"[FAIL] FAIL: earliest period reports a change from a previous period: {body['rankings']}")
+            return False
+
+        print(f"[OK] PASS: Earliest period {earliest!r} ranks {len(body['rankings'])} indicator(s) with no previous period")
+        return True
+
+    except Exception as e:
+        print(f"[FAIL] FAIL: Rankings check failed: {e}")
+        return False
+
 def main():
     """Run all smoke tests"""
     print("=" * 60)
@@ -202,9 +296,12 @@ def main():
         ("Raw files exist", test_raw_files_exist),
         ("Clean files exist", test_clean_files_exist),
         ("Clean data structure", test_clean_data_structure),
+        ("Transform chunking", test_transform_chunking),
         ("Database connection", test_database_connection),
         ("Schema exists", test_schema_exists),
         ("Data loaded", test_data_loaded),
+        ("Rankings for an empty period", test_rankings_empty_period),
+        ("Rankings without a previous period", test_rankings_without_previous_period),
     ]
     
     results = []
@@ -3,9 +3,15 @@ warehouse/load_to_postgres.py
 Loads cleaned CSVs into Postgres warehouse.
 """
 
+import csv
+import io
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+import numpy as np
 import pandas as pd
+from psycopg2.extras import execute_values
 from sqlalchemy import create_engine, text
 from pathlib import Path
 from dotenv import load_dotenv
@@ -23,10 +29,32 @@ PG_USER = os.getenv("PG_USER", "postgres")
 PG_PASSWORD = os.getenv("PG_PASSWORD", "password")
 PG_DB = os.getenv("PG_DB", "uganda_health")
 
+# Cleaned CSVs repeat a handful of indicators, periods and locations on every
+# row; read those columns (by position: indicator, year_label, -, location)
+# as categoricals so each distinct string is stored once
+CLEAN_CSV_DTYPES = {0: "category", 1: "category", 3: "category"}
+# Clean files loaded at once, each by its own worker process and connection
+LOAD_WORKERS = 8
+# Rebuilding the warehouse offline: load in one transaction with the fact
+# indexes dropped even though the table already has rows
+FULL_RELOAD = os.getenv("FULL_RELOAD", "false").lower() == "true"
+# Cells read_csv treats as missing by default; the COPY path maps them to NULL
+# so both loaders agree on which values are empty
+NA_VALUES = (
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+)
+
 ENGINE = create_engine(f"postgresql+psycopg2://{PG_USER}:{PG_PASSWORD}@{PG_HOST}:{PG_PORT}/{PG_DB}", echo=False)
 
-SCHEMA_SQL = Path("warehouse/schema.sql").read_text()
-OBSERVABILITY_SCHEMA = Path("warehouse/observability_schema.sql").read_text()
+@contextmanager
+def _transaction(conn=None):
+    """The caller's open transaction when given, otherwise one of our own"""
+    if conn is not None:
+        yield conn
+    else:
+        with ENGINE.begin() as conn:
+            yield conn
 
 def create_schema():
     print("Creating/verifying schema...")
@@ -37,104 +65,258 @@ def create_schema():
     print(f"Schema file exists: {schema_path.exists()}")
     print(f"Observability schema exists: {observability_path.exists()}")
 
-    global SCHEMA_SQL, OBSERVABILITY_SCHEMA
-    SCHEMA_SQL = schema_path.read_text()
-    print(f"Schema SQL length: {len(SCHEMA_SQL)} characters")
+    # Each schema file is read once, here
+    schema_sql = schema_path.read_text()
+    print(f"Schema SQL length: {len(schema_sql)} characters")
 
-    if not SCHEMA_SQL.strip():
+    if not schema_sql.strip():
         print("ERROR: Schema SQL is empty!")
         return
 
     # Create main warehouse schema
     with ENGINE.connect() as conn:
-        conn.execute(text(SCHEMA_SQL))
+        conn.execute(text(schema_sql))
         conn.commit()
     print("[SUCCESS] Warehouse schema ensured.")
 
     # Create observability schema
     if observability_path.exists():
-        OBSERVABILITY_SCHEMA = observability_path.read_text()
+        observability_sql = observability_path.read_text()
         with ENGINE.connect() as conn:
-            conn.execute(text(OBSERVABILITY_SCHEMA))
+            conn.execute(text(observability_sql))
             conn.commit()
         print("[SUCCESS] Observability schema ensured.")
     else:
         print("[WARNING] Observability schema not found - skipping")
 
-def upsert_dim_indicator(df: pd.DataFrame):
+def upsert_dim_indicator(df: pd.DataFrame, conn):
     # df expected to have column 'indicator' or similar
     if "indicator" not in df.columns:
         # try first column name as indicator
         df = df.rename(columns={df.columns[0]: "indicator"})
-    unique = df["indicator"].dropna().unique()
-    with ENGINE.begin() as conn:
-        for u in unique:
-            conn.execute(text("""
-                INSERT INTO health.dim_indicator (indicator_key, indicator_name)
-                VALUES (:k, :n)
-                ON CONFLICT (indicator_key) DO NOTHING
-            """), {"k": u.lower().replace(" ", "_")[:255], "n": u})
+    # de-duplicate before casting (cheap on categoricals), then again after
+    names = df["indicator"].dropna().drop_duplicates().astype(str).drop_duplicates()
+    keys = names.str.lower().str.replace(" ", "_", regex=False).str.slice(0, 255)
+    rows = list(zip(keys, names))
+    # one multi-row INSERT per 1000 indicators instead of a statement per indicator
+    with conn.connection.cursor() as cur:
+        execute_values(cur, """
+            INSERT INTO health.dim_indicator (indicator_key, indicator_name)
+            VALUES %s
+            ON CONFLICT (indicator_key) DO NOTHING
+        """, rows, page_size=1000)
     print("dim_indicator upsert completed.")
 
-def upsert_date(df: pd.DataFrame):
+def upsert_date(df: pd.DataFrame, conn):
     # df must have 'year_label' like '2016/17' - convert to a date of start of period
-    labels = df["year_label"].dropna().unique()
-    entries = []
-    for lab in labels:
-        # try parse e.g., "2016/17" -> 2016-07-01 as canonical (adjust as needed)
-        try:
-            if "/" in lab:
-                start = int(str(lab).split("/")[0])
-                date_value = f"{start}-07-01"  # choose mid-year marker
-                year = start
-            else:
-                year = int(str(lab).strip())
-                date_value = f"{year}-01-01"
-        except Exception:
-            date_value = None
-            year = None
-        entries.append({"year": year, "period_label": lab, "date_value": date_value})
-    with ENGINE.begin() as conn:
-        for e in entries:
-            conn.execute(text("""
-                INSERT INTO health.dim_date (year, period_label, date_value)
-                VALUES (:year, :label, :dv)
-                ON CONFLICT DO NOTHING
-            """), {"year": e["year"], "label": e["period_label"], "dv": e["date_value"]})
+    labels = df["year_label"].dropna().drop_duplicates().astype(str).drop_duplicates()
+    # e.g. "2016/17" -> 2016-07-01 (mid-year marker), "2016" -> 2016-01-01;
+    # anything else gets no year or date
+    slash = labels.str.contains("/", regex=False)
+    start = labels.where(~slash, labels.str.split("/").str[0])
+    valid = start.str.fullmatch(r"\s*[+-]?\d+\s*")
+    years = start.where(valid).astype("Int64")
+    dates = years.astype(str).str.cat(np.where(slash, "-07-01", "-01-01"))
+    entries = list(zip(years.astype(object).where(valid, None),
+                       labels,
+                       dates.where(valid, None)))
+    with conn.connection.cursor() as cur:
+        execute_values(cur, """
+            INSERT INTO health.dim_date (year, period_label, date_value)
+            VALUES %s
+            ON CONFLICT DO NOTHING
+        """, entries, page_size=1000)
     print("dim_date upserted.")
 
-def load_fact(df: pd.DataFrame):
+def load_fact(df: pd.DataFrame, conn):
     # df should have columns: indicator, year_label, value, optional location columns
-    # Resolve indicator_id and date_id
-    temp_table = "health._temp_load"
-    with ENGINE.begin() as conn:
-        conn.execute(text("CREATE TEMP TABLE IF NOT EXISTS _temp_load (indicator TEXT, year_label TEXT, value NUMERIC, location TEXT)"))
-        # insert rows
-        df_to_insert = df.rename(columns={df.columns[0]: "indicator"})
-        records = df_to_insert.to_dict(orient="records")
-        for r in records:
-            conn.execute(text("INSERT INTO _temp_load (indicator, year_label, value, location) VALUES (:indicator, :year_label, :value, :location)"),
-                         {"indicator": r.get("indicator"), "year_label": r.get("year_label"), "value": r.get("value"), "location": r.get("location")})
+    # Resolve indicator_id and date_id per distinct name in SQL, join them on in
+    # pandas, then COPY the finished rows straight into the fact table
+    facts = df.rename(columns={df.columns[0]: "indicator"}).reindex(columns=["indicator", "year_label", "value"])
+    for col in ("indicator", "year_label"):
+        facts[col] = facts[col].map(str, na_action="ignore")
+    indicators = list(facts["indicator"].dropna().unique())
+    periods = list(facts["year_label"].dropna().unique())
+
+    with conn.connection.cursor() as cur:
+        # a rerun reloads the file, so don't wait on the WAL flush at commit
+        cur.execute("SET LOCAL synchronous_commit = OFF")
         # insert into dim tables as needed
-        conn.execute(text("""
+        execute_values(cur, """
             INSERT INTO health.dim_indicator (indicator_key, indicator_name)
-            SELECT DISTINCT lower(indicator), indicator FROM _temp_load
+            SELECT DISTINCT lower(v.name), v.name FROM (VALUES %s) AS v(name)
             ON CONFLICT (indicator_name) DO NOTHING
-        """))
-        conn.execute(text("""
+        """, [(i,) for i in indicators], page_size=1000)
+        execute_values(cur, """
             INSERT INTO health.dim_date (period_label, date_value)
-            SELECT DISTINCT year_label, NULL::DATE FROM _temp_load
+            SELECT DISTINCT v.label, NULL::DATE FROM (VALUES %s) AS v(label)
             ON CONFLICT DO NOTHING
-        """))
-        # final insert into fact (simple approach: join on names)
-        conn.execute(text("""
-            INSERT INTO health.fact_indicator_values (indicator_id, date_id, value, units, notes)
-            SELECT i.indicator_id, d.date_id, t.value, NULL, NULL
-            FROM _temp_load t
-            LEFT JOIN health.dim_indicator i ON lower(i.indicator_name) = lower(t.indicator)
-            LEFT JOIN health.dim_date d ON d.period_label = t.year_label
-        """))
+        """, [(p,) for p in periods], page_size=1000)
+
+        # ids for each distinct name (simple approach: join on names, case-insensitively)
+        cur.execute("""
+            SELECT t.name, i.indicator_id
+            FROM unnest(%s::text[]) AS t(name)
+            JOIN health.dim_indicator i ON lower(i.indicator_name) = lower(t.name)
+        """, (indicators,))
+        indicator_ids = pd.DataFrame(cur.fetchall(), columns=["indicator", "indicator_id"], dtype=object)
+        cur.execute("""
+            SELECT period_label, date_id FROM health.dim_date
+            WHERE period_label = ANY(%s::text[])
+        """, (periods,))
+        date_ids = pd.DataFrame(cur.fetchall(), columns=["year_label", "date_id"], dtype=object)
+
+        # left joins, so rows with an unknown indicator or period keep NULL ids
+        facts = facts.merge(indicator_ids, on="indicator", how="left").merge(date_ids, on="year_label", how="left")
+        buf = io.StringIO()
+        facts[["indicator_id", "date_id", "value"]].to_csv(buf, index=False, header=False)
+        buf.seek(0)
+        cur.copy_expert("COPY health.fact_indicator_values (indicator_id, date_id, value) FROM STDIN WITH (FORMAT csv)", buf)
     print("Fact load complete.")
+    # facts loaded without an indicator or date id
+    return int((facts["indicator_id"].isna() | facts["date_id"].isna()).sum())
+
+def load_clean_csv(path: Path, conn=None):
+    """
+    Load one cleaned CSV (indicator, year_label, value, ... by position) in a
+    single transaction (conn's, if given): COPY it as text into a staging
+    table, then fill dim_indicator, dim_date and the fact table from it in
+    SQL, so the rows never become Python objects
+
+    Returns:
+        Tuple of (row count, {column: null count} for indicator/year_label/value,
+        facts loaded without an indicator or date id)
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        ncols = len(next(csv.reader(f)))
+        f.seek(0)
+        columns = [f"c{i}" for i in range(ncols)]
+        with _transaction(conn) as conn, conn.connection.cursor() as cur:
+            # a rerun reloads the file, so don't wait on the WAL flush at commit
+            cur.execute("SET LOCAL synchronous_commit = OFF")
+            # temp tables already skip WAL; ON COMMIT DROP keeps the pooled session clean
+            cur.execute(f"CREATE TEMP TABLE _stage_csv (n SERIAL, {', '.join(c + ' TEXT' for c in columns)}) ON COMMIT DROP")
+            cur.copy_expert(f"COPY _stage_csv ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, HEADER true)", f)
+
+            # read_csv's missing-value markers ('NA', 'nan', ...) become NULL, as they did via pandas
+            cur.execute("""
+                CREATE TEMP TABLE _stage_fact ON COMMIT DROP AS
+                SELECT n,
+                       CASE WHEN c0 = ANY(%(na)s) THEN NULL ELSE c0 END AS indicator,
+                       CASE WHEN c1 = ANY(%(na)s) THEN NULL ELSE c1 END AS year_label,
+                       CASE WHEN c2 = ANY(%(na)s) THEN NULL ELSE c2 END::NUMERIC AS value
+                FROM _stage_csv
+            """, {"na": list(NA_VALUES)})
+            cur.execute("""
+                SELECT count(*), count(*) - count(indicator), count(*) - count(year_label), count(*) - count(value)
+                FROM _stage_fact
+            """)
+            rows, *nulls = cur.fetchone()
+
+            # same keys as upsert_dim_indicator; a name whose key is taken is skipped.
+            # Sorted so workers loading files in parallel take row locks in one order
+            cur.execute("""
+                INSERT INTO health.dim_indicator (indicator_key, indicator_name)
+                SELECT DISTINCT left(replace(lower(indicator), ' ', '_'), 255), indicator
+                FROM _stage_fact
+                WHERE indicator IS NOT NULL
+                ORDER BY 1, 2
+                ON CONFLICT DO NOTHING
+            """)
+            # same periods as upsert_date: "2016/17" -> 2016-07-01, "2016" -> 2016-01-01
+            cur.execute("""
+                INSERT INTO health.dim_date (year, period_label, date_value)
+                SELECT year, year_label,
+                       (year::TEXT || CASE WHEN strpos(year_label, '/') > 0 THEN '-07-01' ELSE '-01-01' END)::DATE
+                FROM (
+                    SELECT DISTINCT year_label,
+                           CASE WHEN split_part(year_label, '/', 1) ~ '^[[:space:]]*[+-]?[0-9]+[[:space:]]*$'
+                                THEN trim(split_part(year_label, '/', 1))::INT END AS year
+                    FROM _stage_fact
+                    WHERE year_label IS NOT NULL
+                ) periods
+                ORDER BY year_label
+                ON CONFLICT DO NOTHING
+            """)
+
+            # join on names (case-insensitively for indicators), keeping file order;
+            # this file's orphans are counted off the inserted rows
+            cur.execute("""
+                WITH inserted AS (
+                    INSERT INTO health.fact_indicator_values (indicator_id, date_id, value)
+                    SELECT i.indicator_id, d.date_id, s.value
+                    FROM _stage_fact s
+                    LEFT JOIN health.dim_indicator i ON lower(i.indicator_name) = lower(s.indicator)
+                    LEFT JOIN health.dim_date d ON d.period_label = s.year_label
+                    ORDER BY s.n
+                    RETURNING indicator_id, date_id
+                )
+                SELECT count(*) FROM inserted WHERE indicator_id IS NULL OR date_id IS NULL
+            """)
+            orphans = cur.fetchone()[0]
+            # the next file may stage in this same transaction
+            cur.execute("DROP TABLE _stage_csv, _stage_fact")
+    print("Dimensions and facts loaded.")
+    return rows, dict(zip(["indicator", "year_label", "value"], nulls)), orphans
+
+def _reset_engine():
+    # Pool initializer: a forked worker must not reuse the parent's connections
+    ENGINE.dispose(close=False)
+
+def _load_one(path: Path, conn=None):
+    """Load one clean CSV; runs in a worker process, or in conn's transaction"""
+    print(f"\nProcessing {path.name}...")
+    with open(path, newline="", encoding="utf-8") as f:
+        ncols = len(next(csv.reader(f), []))
+
+    if ncols >= 3:
+        # first -> indicator, year_label, value; all loaded in SQL
+        rows, null_counts, orphans = load_clean_csv(path, conn)
+    else:
+        # columns can't be mapped by position; let pandas line them up
+        df = pd.read_csv(path, dtype=CLEAN_CSV_DTYPES)
+        rows, ncols = df.shape
+        # one null-count pass over the key columns that are present
+        present = [field for field in ['indicator', 'year_label', 'value'] if field in df.columns]
+        null_counts = {field: int(count) for field, count in df[present].isnull().sum().items()}
+        # one connection and one transaction for the whole file
+        with _transaction(conn) as conn:
+            upsert_dim_indicator(df, conn)
+            upsert_date(df, conn)
+            orphans = load_fact(df, conn)
+    return ncols, rows, null_counts, orphans
+
+@contextmanager
+def fact_indexes_dropped(conn):
+    # Drop the secondary fact indexes in conn's transaction and rebuild each
+    # one before it commits: one sort+build per index is cheaper than
+    # maintaining the b-trees row by row. A failed load rolls the drop back
+    indexes = conn.execute(text("""
+        SELECT indexname, indexdef FROM pg_indexes
+        WHERE schemaname = 'health' AND tablename = 'fact_indicator_values'
+          AND indexname NOT LIKE '%_pkey'
+    """)).fetchall()
+    for name, _ in indexes:
+        conn.execute(text(f'DROP INDEX IF EXISTS health."{name}"'))
+    yield
+    conn.execute(text("SET LOCAL maintenance_work_mem = '512MB'"))
+    for _, indexdef in indexes:
+        conn.exec_driver_sql(indexdef)
+    print(f"Rebuilt {len(indexes)} fact indexes.")
+
+def fact_table_empty() -> bool:
+    # an empty fact table has no API readers to keep indexed
+    with ENGINE.connect() as conn:
+        return conn.execute(text("SELECT NOT EXISTS (SELECT 1 FROM health.fact_indicator_values)")).scalar()
+
+def refresh_materialized_views():
+    # rebuild the pre-joined projection read by the API and analyze_data.py,
+    # then the aggregates computed from it; CONCURRENTLY (keyed on their
+    # unique indexes) lets API reads carry on during the refresh
+    with ENGINE.begin() as conn:
+        conn.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY health.mv_flat"))
+        conn.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY health.mv_stats"))
+    print("mv_flat and mv_stats refreshed.")
 
 def main():
     # Use ObservedPipeline context manager
@@ -152,28 +334,35 @@ def main():
         records_loaded = 0
         files_processed = 0
 
-        for path in csv_files:
-            print(f"\nProcessing {path.name}...")
-            df = pd.read_csv(path)
-            print(f"  - Loaded {len(df)} rows, {len(df.columns)} columns")
+        with ExitStack() as stack:
+            if FULL_RELOAD or fact_table_empty():
+                # Nothing is served from the facts yet (or the rebuild is
+                # offline): load every file in one transaction, with the
+                # indexes dropped and rebuilt inside it
+                print("Bulk load: fact indexes are rebuilt after the load")
+                conn = stack.enter_context(ENGINE.begin())
+                stack.enter_context(fact_indexes_dropped(conn))
+                results = (_load_one(path, conn) for path in csv_files)
+            else:
+                # The API is reading the facts: keep their indexes and load
+                # the files in parallel, each in its own transaction
+                max_workers = max(1, min(len(csv_files), LOAD_WORKERS))
+                executor = stack.enter_context(ProcessPoolExecutor(max_workers=max_workers, initializer=_reset_engine))
+                futures = {path: executor.submit(_load_one, path) for path in csv_files}
+                results = (futures[path].result() for path in csv_files)
 
-            total_records += len(df)
+            # results are logged here, in file order, as each file finishes
+            for path, (ncols, rows, null_counts, orphans) in zip(csv_files, results):
+                print(f"  - {path.name}: loaded {rows} rows, {ncols} columns")
 
-            # ensure columns exist: indicator, year_label, value
-            if df.shape[1] >= 3:
-                # attempt to map first -> indicator, year_label, value
-                df = df.rename(columns={df.columns[0]: "indicator", df.columns[1]: "year_label", df.columns[2]: "value"})
-                print(f"  - Mapped columns: {list(df.columns)}")
+                total_records += rows
 
-            # Data quality checks before loading
-            validator = DataQualityValidator(observer)
+                # Data quality checks on what was loaded
+                validator = DataQualityValidator(observer)
 
-            # Check completeness of key fields
-            key_fields = ['indicator', 'year_label', 'value']
-            for field in key_fields:
-                if field in df.columns:
-                    null_count = df[field].isnull().sum()
-                    null_pct = null_count / len(df)
+                # Check completeness of key fields
+                for field, null_count in null_counts.items():
+                    null_pct = null_count / rows if rows else float("nan")
                     observer.log_quality_check(
                         check_name=f'warehouse_completeness_{field}',
                         passed=null_pct == 0,  # Should be 0 nulls at this stage
@@ -182,52 +371,60 @@ def main():
                         column_name=field,
                         metric_value=1 - null_pct,
                         threshold_value=1.0,
-                        row_count=len(df),
-                        failure_count=int(null_count)
+                        row_count=rows,
+                        failure_count=null_count
                     )
 
-            # Load dimensions and facts
-            upsert_dim_indicator(df)
-            upsert_date(df)
-            load_fact(df)
-
-            # Track lineage
-            observer.track_lineage(
-                target_table='fact_indicator_values',
-                target_column='value',
-                source_file=str(path),
-                source_column='value',
-                transformation_logic='Loaded from clean CSV via upsert',
-                transformation_type='direct_copy'
-            )
-
-            # Check referential integrity
-            with ENGINE.connect() as conn:
-                orphan_check = conn.execute(text("""
-                    SELECT COUNT(*) FROM health.fact_indicator_values
-                    WHERE indicator_id IS NULL OR date_id IS NULL
-                """)).scalar()
+                # Track lineage
+                observer.track_lineage(
+                    target_table='fact_indicator_values',
+                    target_column='value',
+                    source_file=str(path),
+                    source_column='value',
+                    transformation_logic='Loaded from clean CSV via upsert',
+                    transformation_type='direct_copy'
+                )
 
+                # Check referential integrity of this file's facts
                 observer.log_quality_check(
                     check_name='warehouse_referential_integrity',
-                    passed=orphan_check == 0,
+                    passed=orphans == 0,
                     check_category='consistency',
                     table_name='fact_indicator_values',
-                    metric_value=1.0 if orphan_check == 0 else 0.0,
+                    metric_value=1.0 if orphans == 0 else 0.0,
                     threshold_value=1.0,
-                    failure_count=int(orphan_check),
-                    details={'orphan_records': int(orphan_check)}
+                    failure_count=int(orphans),
+                    details={'orphan_records': int(orphans), 'source_file': path.name}
                 )
 
-            records_loaded += len(df)
-            files_processed += 1
-            print(f"  [SUCCESS] Completed processing {path.name}")
+                records_loaded += rows
+                files_processed += 1
+                print(f"  [SUCCESS] Completed processing {path.name}")
+
+        refresh_materialized_views()
 
         # Final warehouse statistics
         with ENGINE.connect() as conn:
-            fact_count = conn.execute(text("SELECT COUNT(*) FROM health.fact_indicator_values")).scalar()
-            indicator_count = conn.execute(text("SELECT COUNT(*) FROM health.dim_indicator")).scalar()
-            date_count = conn.execute(text("SELECT COUNT(*) FROM health.dim_date")).scalar()
+            # one scan of the fact table gives both its exact size and the
+            # table-wide orphan count; the dims are small
+            fact_count, orphan_count, indicator_count, date_count = conn.execute(text("""
+                SELECT COUNT(*),
+                       COUNT(*) FILTER (WHERE indicator_id IS NULL OR date_id IS NULL),
+                       (SELECT COUNT(*) FROM health.dim_indicator),
+                       (SELECT COUNT(*) FROM health.dim_date)
+                FROM health.fact_indicator_values
+            """)).one()
+
+            observer.log_quality_check(
+                check_name='warehouse_referential_integrity_total',
+                passed=orphan_count == 0,
+                check_category='consistency',
+                table_name='fact_indicator_values',
+                metric_value=1.0 if orphan_count == 0 else 0.0,
+                threshold_value=1.0,
+                failure_count=int(orphan_count),
+                details={'orphan_records': int(orphan_count)}
+            )
 
             observer.log_quality_check(
                 check_name='warehouse_fact_count',
@@ -91,6 +91,7 @@ CREATE TABLE IF NOT EXISTS metadata.source_files (
     file_path TEXT UNIQUE NOT NULL,
     file_name TEXT NOT NULL,
     file_hash TEXT NOT NULL, -- MD5/SHA256 for change detection
+    file_fingerprint TEXT, -- mtime_ns:size, lets unchanged files skip re-hashing
     file_size_bytes BIGINT,
     sheet_count INT,
     row_count INT,
@@ -102,6 +103,9 @@ CREATE TABLE IF NOT EXISTS metadata.source_files (
     status TEXT CHECK (status IN ('new', 'processed', 'failed', 'archived'))
 );
 
+-- Databases created before file_fingerprint existed
+ALTER TABLE metadata.source_files ADD COLUMN IF NOT EXISTS file_fingerprint TEXT;
+
 CREATE INDEX IF NOT EXISTS idx_source_files_hash
 ON metadata.source_files(file_hash);
 
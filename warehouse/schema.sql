@@ -39,4 +39,64 @@ CREATE TABLE IF NOT EXISTS health.fact_indicator_values (
 );
 
 -- Indexes
-CREATE INDEX IF NOT EXISTS idx_fact_indicator_date ON health.fact_indicator_values(indicator_id, date_id);
+CREATE INDEX IF NOT EXISTS idx_fact_indicator_date ON health.fact_indicator_values(indicator_id, date_id) INCLUDE (value);
+CREATE INDEX IF NOT EXISTS idx_fact_date ON health.fact_indicator_values(date_id);
+CREATE INDEX IF NOT EXISTS idx_dim_date_year ON health.dim_date(year);
+CREATE INDEX IF NOT EXISTS idx_dim_indicator_name_lower ON health.dim_indicator(LOWER(indicator_name) text_pattern_ops);
+
+-- mv_flat: pre-joined fact/indicator/date projection used by the API and analysis
+-- Refreshed at the end of each warehouse load (REFRESH MATERIALIZED VIEW health.mv_flat)
+CREATE MATERIALIZED VIEW IF NOT EXISTS health.mv_flat AS
+SELECT
+    f.fact_id,
+    f.indicator_id,
+    i.indicator_name,
+    i.category,
+    d.period_label,
+    d.year,
+    f.value,
+    f.units,
+    f.notes
+FROM health.fact_indicator_values f
+JOIN health.dim_indicator i ON f.indicator_id = i.indicator_id
+JOIN health.dim_date d ON f.date_id = d.date_id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_flat_fact ON health.mv_flat(fact_id);
+CREATE INDEX IF NOT EXISTS idx_mv_flat_period ON health.mv_flat(period_label);
+CREATE INDEX IF NOT EXISTS idx_mv_flat_year ON health.mv_flat(year);
+-- Keyset pagination indexes for /health/indicators: one per sort key, on the
+-- same NULL-coalescing expressions as SORT_COLUMNS in api/main.py
+CREATE INDEX IF NOT EXISTS idx_mv_flat_sort_indicator ON health.mv_flat(COALESCE(indicator_name, ''), fact_id);
+CREATE INDEX IF NOT EXISTS idx_mv_flat_sort_period ON health.mv_flat(COALESCE(period_label, ''), fact_id);
+CREATE INDEX IF NOT EXISTS idx_mv_flat_sort_year ON health.mv_flat(COALESCE(year, -2147483648), fact_id);
+CREATE INDEX IF NOT EXISTS idx_mv_flat_sort_value ON health.mv_flat(COALESCE(value, '-Infinity'::numeric), fact_id);
+
+-- mv_stats: single-row dataset aggregates served by /health/stats and /health/quality/dashboard
+-- Refreshed after mv_flat at the end of each warehouse load
+CREATE MATERIALIZED VIEW IF NOT EXISTS health.mv_stats AS
+SELECT
+    COUNT(*) as total_records,
+    COUNT(DISTINCT indicator_id) as unique_indicators,
+    COUNT(DISTINCT period_label) as unique_periods,
+    COUNT(CASE WHEN value IS NULL THEN 1 END) as null_values,
+    COUNT(CASE WHEN value = 0 THEN 1 END) as zero_values,
+    COUNT(CASE WHEN value < 0 THEN 1 END) as negative_values,
+    ROUND(AVG(value), 2) as avg_value,
+    MIN(value) as min_value,
+    MAX(value) as max_value
+FROM health.mv_flat;
+
+-- Unique index so the view can be refreshed CONCURRENTLY; it has a single
+-- row, so any never-NULL column is unique
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_stats_row ON health.mv_stats(total_records);
+
+-- Trigram index for the API's substring search on indicator names (ILIKE '%...%')
+-- Skipped when the pg_trgm contrib extension is not installed on the server
+DO $$
+BEGIN
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    CREATE INDEX IF NOT EXISTS idx_mv_flat_indicator_trgm ON health.mv_flat USING gin (indicator_name gin_trgm_ops);
+EXCEPTION WHEN OTHERS THEN
+    RAISE NOTICE 'pg_trgm not available, skipping trigram index: %', SQLERRM;
+END
+$$;